@@ -19,7 +19,7 @@ EMB_MODEL = os.getenv("EMB_MODEL", "nomic-embed-text")
 # CHROMA_PATH  = (PROJECT_ROOT / os.getenv("CHROMA_PATH", "data/chroma_db")).resolve()
 CHROMA_PATH = Path(os.getenv("CHROMA_PATH", "../data/chroma_db"))
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "rag_docs")
-CHROMA_DISTANCE = os.getenv("CHROMA_DISTANCE", "cosine")
+CHROMA_DISTANCE = os.getenv("CHROMA_DISTANCE", "ip") # embeddings are unit-normalized, so ip == cosine
 
 # ---- DATA INGESTION PIPELINE ----
 CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4.0")) 
@@ -28,7 +28,9 @@ CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "140"))
 CHUNK_CHARS = int(CHUNK_TOKENS * CHARS_PER_TOKEN)
 CHUNK_OVERLAP_CHARS = int(CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN)
 HASH_ALGO = os.getenv("HASH_ALGO", "xxh3")
-INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "2048"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
 
 # ---- LOGGING ----
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -1,15 +1,35 @@
 # Creates text embeddings via Ollama's embedding model (with retries and optional normalization).
 
 import time
-import math
+import httpx
+import numpy as np
 import ollama
 from config import EMB_MODEL, OLLAMA_HOST
 
+# One keep-alive client per process so batches reuse the same connection to Ollama
+_http: httpx.Client | None = None
+
+
+def _http_client() -> httpx.Client:
+    """Memoize a single keep-alive HTTP client per process."""
+    global _http
+    if _http is None:
+        _http = httpx.Client(base_url=OLLAMA_HOST)
+    return _http
 
 def _l2_normalize(vec: list[float]) -> list[float]:
     """Normalize a vector to unit length (recommended for cosine similarity)."""
-    n = math.sqrt(sum(x * x for x in vec))
-    return [x / n for x in vec] if n > 0 else vec
+    arr = np.asarray(vec, dtype=np.float32)
+    n = np.sqrt(np.dot(arr, arr))
+    if n > 0:
+        arr /= n
+    return arr.tolist()
+
+def _l2_normalize_rows(arr: np.ndarray) -> np.ndarray:
+    """Normalize every row of a (B, D) matrix to unit length in place; zero rows are left as-is."""
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    np.divide(arr, norms, out=arr, where=norms > 0)
+    return arr
 
 def get_embeddings(
     text: str,
@@ -39,3 +59,43 @@ def get_embeddings(
                 time.sleep(0.5 * (2 ** attempt))
             else:
                 raise ConnectionError(f"Embedding failed after {retries} attempts: {e}") from e
+
+def get_embeddings_batch(
+    texts: list[str],
+    *,
+    normalize: bool = True,
+    timeout: float = 120.0,
+    retries: int = 3,
+) -> np.ndarray:
+    """Return a (B, D) float32 array of embeddings with a single POST to Ollama's batch `/api/embed` endpoint.
+
+    Falls back to per-prompt `get_embeddings` if the server does not return `embeddings`.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if any(not t or not t.strip() for t in texts):
+        raise ValueError("get_embeddings_batch: empty text in batch")
+
+    embs: list[list[float]] | None = None
+    for attempt in range(retries):
+        try:
+            resp = _http_client().post(
+                "/api/embed",
+                json={"model": EMB_MODEL, "input": texts},
+                timeout=timeout,
+            )
+            resp.raise_for_status()
+            embs = resp.json().get("embeddings")
+            break
+        except Exception as e:
+            if attempt < retries - 1:
+                time.sleep(0.5 * (2 ** attempt))
+            else:
+                raise ConnectionError(f"Batch embedding failed after {retries} attempts: {e}") from e
+
+    if not embs or len(embs) != len(texts):
+        # Older Ollama servers: fall back to the legacy single-prompt endpoint
+        embs = [get_embeddings(t, normalize=False, timeout=timeout, retries=retries) for t in texts]
+
+    arr = np.asarray(embs, dtype=np.float32)
+    return _l2_normalize_rows(arr) if normalize else arr
@@ -3,68 +3,117 @@
         1. Extract text from PDFs/TXTs
         2. Split it into chunks
         3. Hash chunks (for stable IDs / deduplication)
-        4. Upsert into ChromaDB collection (idempotent)
+        4. Embed new chunks via Ollama's batch endpoint
+        5. Upsert into ChromaDB collection with explicit embeddings (idempotent)
 """
 
 from dataclasses import dataclass
 from pathlib import Path
+from collections import deque
 from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
 import time
 import argparse
 import shutil
 import logging
+import os
+import sys
 
 import chromadb
-from chromadb.utils import embedding_functions
+import numpy as np
 
+from embeddings import get_embeddings_batch
 from scripts.utils import extract_text_from_pdf, chunk_text, hash_text, stable_chunk_id
 from config import (
     CHROMA_PATH,
     CHROMA_COLLECTION_NAME,
-    EMB_MODEL,
     CHROMA_DISTANCE,
     RAW_PDFS,
     RAW_TXTS,
     INGEST_BATCH_SIZE,
-    OLLAMA_HOST,
+    EMBED_BATCH_SIZE,
+    PDF_WORKERS,
 )
 
 logger = logging.getLogger(__name__)
 
+# Backpressure: PDFs extracted ahead per worker, and batches queued between embed and upsert
+_PDF_PREFETCH_PER_WORKER = 2
+_MAX_IN_FLIGHT_BATCHES = 2
+
+
+def _walk(root: Path, ext: str) -> Iterator[str]:
+    """Yield paths of regular files under `root` ending in `ext` (DirEntry caches the type, so no extra stat)."""
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith(ext) and e.is_file():
+                    yield e.path
 
 def iter_raw_texts() -> Iterator[tuple[str, str]]:
     """Yield (filename, text) from RAW_PDFS / RAW_TXTs. Skips files with errors."""
     RAW_PDFS.mkdir(parents=True, exist_ok=True)
     RAW_TXTS.mkdir(parents=True, exist_ok=True)
 
-    # PDFs
-    for p in sorted(RAW_PDFS.rglob("*.pdf")):
-        try:
-            txt = extract_text_from_pdf(p)
-            if txt and txt.strip():
-                yield (p.name, txt)
-        except FileNotFoundError:
-            logger.debug("File not found (skipping): %s", p)
-        except Exception as e:
-            logger.error("Failed to process PDF '%s' (skipping): %s", p, e)
+    # PDFs (CPU-bound extraction, one file per worker process).
+    # Only a bounded window of files is in flight, so extracted text can't pile up in memory
+    # while the consumer is busy embedding.
+    pdfs = sorted(_walk(RAW_PDFS, ".pdf"))
+    if pdfs:
+        workers = max(1, min(PDF_WORKERS, len(pdfs)))
+        todo = iter(pdfs)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = {
+                ex.submit(extract_text_from_pdf, p): p
+                for p in islice(todo, workers * _PDF_PREFETCH_PER_WORKER)
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    p = futures.pop(fut)
+                    for nxt in islice(todo, 1):
+                        futures[ex.submit(extract_text_from_pdf, nxt)] = nxt
+                    try:
+                        txt = fut.result()
+                        if txt and txt.strip():
+                            yield (os.path.basename(p), txt)
+                    except FileNotFoundError:
+                        logger.debug("File not found (skipping): %s", p)
+                    except Exception as e:
+                        logger.error("Failed to process PDF '%s' (skipping): %s", p, e)
 
     # TXTs
-    for p in sorted(RAW_TXTS.rglob("*.txt")):
+    for p in sorted(_walk(RAW_TXTS, ".txt")):
         try:
-            txt = p.read_text(encoding="utf-8", errors="ignore")
+            with open(p, encoding="utf-8", errors="ignore") as f:
+                txt = f.read()
             if txt.strip():
-                yield (p.name, txt)
+                yield (os.path.basename(p), txt)
         except FileNotFoundError:
             logger.debug("File not found (skipping): %s", p)
         except Exception as e:
             logger.error("Failed to process TXT '%s' (skipping): %s", p, e)
 
-def existing_ids(col, ids: list[str]) -> set[str]:
-    """Return the subset of IDs that already exist in the collection (fast check)."""
-    if not ids:
-        return set()
-    got = col.get(ids=ids, include=[])
-    return set(got.get("ids", []))
+def load_known_ids(col, page_size: int = 10_000) -> set[str]:
+    """Return every ID already stored in the collection (one paged scan at ingest start)."""
+    known: set[str] = set()
+    offset = 0
+    while True:
+        got = col.get(include=[], limit=page_size, offset=offset)
+        ids = got.get("ids", [])
+        known.update(ids)
+        if len(ids) < page_size:
+            return known
+        offset += page_size
+
+def embed_documents(docs: list[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Embed documents in Ollama-sized sub-batches and return one (len(docs), D) array."""
+    parts = [get_embeddings_batch(docs[i : i + batch_size]) for i in range(0, len(docs), batch_size)]
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
 
 @dataclass(slots=True)
 class IngestStats:
@@ -78,7 +127,7 @@ def ingest(*, rebuild: bool = False, purge: bool = False, batch_size: int = INGE
     """
         - Gather raw texts (iter_raw_texts)
         - Chunk, hash, and ID them
-        - Upsert into ChromaDB (Chroma embeds via embedding_function)
+        - Embed new chunks and upsert them into ChromaDB with explicit embeddings
     """
     t0 = time.perf_counter()
 
@@ -94,72 +143,93 @@ def ingest(*, rebuild: bool = False, purge: bool = False, batch_size: int = INGE
         except Exception:
             pass
 
-    ef = embedding_functions.OllamaEmbeddingFunction(
-        url=f"{OLLAMA_HOST}/api/embeddings",
-        model_name=EMB_MODEL,
-    )
-
+    # Embeddings are computed here and passed to upsert, so the collection needs no embedding_function
     col = client.get_or_create_collection(
         CHROMA_COLLECTION_NAME,
         metadata={"hnsw:space": CHROMA_DISTANCE},
-        embedding_function=ef,
+        embedding_function=None,
     )
 
+    # Larger batches amortize HNSW insert overhead; Chroma rejects anything above its max batch size
+    max_batch = client.get_max_batch_size()
+    if batch_size > max_batch:
+        logger.info("Batch size %s exceeds Chroma max %s; clamping", batch_size, max_batch)
+        batch_size = max_batch
+
+    known_ids = load_known_ids(col)
+    logger.debug("Loaded %s known chunk IDs", len(known_ids))
+
     stats = IngestStats()
     ids_buf: list[str] = []
     docs_buf: list[str] = []
     meta_buf: list[dict] = []
 
+    # Pipeline stages: this thread chunks/hashes, one thread embeds (Ollama), one thread upserts (Chroma).
+    # Each stage is FIFO, so batch N+1 is embedded while batch N is indexed and batch N+2 is chunked.
+    embedder = ThreadPoolExecutor(max_workers=1)
+    upserter = ThreadPoolExecutor(max_workers=1)
+    in_flight: deque[Future] = deque()
+
+    def upsert(ids: list[str], docs: list[str], metas: list[dict], vecs: Future) -> None:
+        col.upsert(ids=ids, documents=docs, metadatas=metas, embeddings=vecs.result())
+
     def flush() -> None:
-        """Upload current batch to Chroma (dedupe before upsert)."""
-        nonlocal ids_buf, docs_buf, meta_buf, stats
+        """Hand the current column buffers to the embed/upsert pipeline and start fresh ones."""
+        nonlocal ids_buf, docs_buf, meta_buf
         if not ids_buf:
             return
 
-        have = existing_ids(col, ids_buf)
-        keep_idx = [i for i, _id in enumerate(ids_buf) if _id not in have]
-
-        if keep_idx:
-            new_ids  = [ids_buf[i]  for i in keep_idx]
-            new_docs = [docs_buf[i] for i in keep_idx]
-            new_meta = [meta_buf[i] for i in keep_idx]
-
-            col.upsert(
-                ids=new_ids,
-                documents=new_docs,
-                metadatas=new_meta,
-            )
-            stats.added += len(new_ids)
-
-        stats.skipped += len(have)
-        logger.debug("Flush: new=%s skipped=%s buffer_cleared", len(keep_idx), len(have))
-
-        ids_buf.clear()
-        docs_buf.clear()
-        meta_buf.clear()
-
-    for fname, full_text in iter_raw_texts():
-        stats.files += 1
-        for idx, ch in enumerate(chunk_text(full_text)):
-            stats.chunks += 1
-
-            digest = hash_text(ch)
-            cid = stable_chunk_id(Path(fname).stem, idx, digest)
-
-            ids_buf.append(cid)
-            docs_buf.append(ch)
-            meta_buf.append({
-                "file": fname,
-                "chunk_index": idx,
-                "digest": digest,
-                "type": "pdf" if fname.lower().endswith(".pdf") else "txt",
-                "source_path": str(RAW_PDFS / fname) if fname.lower().endswith(".pdf") else str(RAW_TXTS / fname),
-            })
-
-            if len(ids_buf) >= batch_size:
-                flush()
-
-    flush()
+        while len(in_flight) >= _MAX_IN_FLIGHT_BATCHES:
+            in_flight.popleft().result() # re-raises embed/upsert errors
+        vecs = embedder.submit(embed_documents, docs_buf)
+        in_flight.append(upserter.submit(upsert, ids_buf, docs_buf, meta_buf, vecs))
+        stats.added += len(ids_buf)
+        logger.debug("Flush: new=%s queued=%s", len(ids_buf), len(in_flight))
+
+        # The queued batch owns the old lists now; rebinding avoids copying them
+        ids_buf, docs_buf, meta_buf = [], [], []
+
+    try:
+        for fname, full_text in iter_raw_texts():
+            stats.files += 1
+
+            # Per-file constants, computed once and shared by every chunk's metadata
+            stem = Path(fname).stem
+            is_pdf = fname.lower().endswith(".pdf")
+            meta_tmpl = {
+                "file": sys.intern(fname),
+                "type": "pdf" if is_pdf else "txt",
+                "source_path": str((RAW_PDFS if is_pdf else RAW_TXTS) / fname),
+            }
+
+            for idx, ch in enumerate(chunk_text(full_text)):
+                stats.chunks += 1
+
+                digest = hash_text(ch)
+                cid = stable_chunk_id(stem, idx, digest)
+                # Dedupe at the source so known chunks are never decoded, given metadata, or buffered
+                if cid in known_ids:
+                    stats.skipped += 1
+                    continue
+                known_ids.add(cid)
+
+                meta = meta_tmpl.copy()
+                meta["chunk_index"] = idx
+                meta["digest"] = digest
+
+                ids_buf.append(cid)
+                docs_buf.append(str(ch, "utf-8")) # decode only at the Chroma boundary
+                meta_buf.append(meta)
+
+                if len(ids_buf) >= batch_size:
+                    flush()
+
+        flush()
+        while in_flight:
+            in_flight.popleft().result()
+    finally:
+        embedder.shutdown(wait=True, cancel_futures=True)
+        upserter.shutdown(wait=True, cancel_futures=True)
     stats.seconds = time.perf_counter() - t0
 
     logger.info(
@@ -170,7 +240,7 @@ def ingest(*, rebuild: bool = False, purge: bool = False, batch_size: int = INGE
 
 def _parse_args():
     parser = argparse.ArgumentParser(
-        description="Ingest PDFs/TXTs into ChromaDB (Chroma performs embeddings via Ollama)."
+        description="Ingest PDFs/TXTs into ChromaDB (embeddings computed via Ollama's batch endpoint)."
     )
     parser.add_argument("--rebuild", action="store_true", help="Drop & recreate the collection before ingest.")
     parser.add_argument("--purge", action="store_true", help="Delete entire Chroma DB directory before ingest.")
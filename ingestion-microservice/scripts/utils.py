@@ -2,29 +2,52 @@
 
 from pathlib import Path
 import hashlib
+import re
 import xxhash
-from pypdf import PdfReader
+import pypdfium2 as pdfium
 from config import CHUNK_CHARS, CHUNK_OVERLAP_CHARS, HASH_ALGO
 
+_NON_SPACE = re.compile(rb"\S")
 
-def hash_text(text: str) -> str:
+
+def _md5_hexdigest(data: bytes | memoryview) -> str:
+    return hashlib.md5(data).hexdigest() # cryptographically-secure MD5 - slow algorithm (fallback) to generate a hash & return its hex string
+
+# Pick the hash function once at import so the per-chunk path is a single call
+_hexdigest = (
+    xxhash.xxh3_128_hexdigest # XXH3 - fast algo. to generate a 128-bit hash & return its hex string
+    if HASH_ALGO.lower() == "xxh3"
+    else _md5_hexdigest
+)
+
+def hash_text(text: str | bytes | memoryview) -> str:
     """Generates a unique cryptographic hash (MD5 or XXH3) of input text for deduplication."""
     
-    data = text.encode("utf-8")
-    if HASH_ALGO.lower() == "xxh3":
-        return xxhash.xxh3_128_hexdigest(data) # XXH3 - fast algo. to generate a 128-bit hash & return its hex string
-    return hashlib.md5(data).hexdigest() # cryptographically-secure MD5 - slow algorithm (fallback) to generate a hash & return its hex string
+    return _hexdigest(text.encode("utf-8") if isinstance(text, str) else text) # buffers are hashed zero-copy
+
+def _snap_utf8(data: bytes, i: int) -> int:
+    """Move byte offset `i` back to the start of a UTF-8 code point."""
+    
+    while 0 < i < len(data) and (data[i] & 0xC0) == 0x80:
+        i -= 1
+    return i
 
-def chunk_text(text: str) -> list[str]:
-    """Split text into overlapping chunks of fixed size."""
+def chunk_text(text: str | bytes) -> list[memoryview]:
+    """Split text into overlapping chunks of fixed size.
+    
+    The document is encoded to UTF-8 once; chunks are zero-copy memoryviews over that
+    buffer, with window sizes counted in bytes and snapped to code-point boundaries.
+    """
     
-    chunks: list[str] = []
+    # Strip once at the document edges instead of per chunk; inner chunk boundaries keep their whitespace
+    data = (text.encode("utf-8") if isinstance(text, str) else bytes(text)).strip()
+    view = memoryview(data)
     step = max(1, CHUNK_CHARS - CHUNK_OVERLAP_CHARS)
-    for start in range(0, len(text), step):
-        chunk = text[start : start + CHUNK_CHARS].strip()
-        if chunk:
-            chunks.append(chunk)
-    return chunks
+    bounds = [
+        (_snap_utf8(data, start), _snap_utf8(data, start + CHUNK_CHARS))
+        for start in range(0, len(data), step)
+    ]
+    return [view[s:e] for s, e in bounds if _NON_SPACE.search(data, s, e)]
 
 def stable_chunk_id(filename: str, idx: int, digest: str) -> str:
     """Create a stable chunk ID from filename, chunk index, and content hash."""
@@ -35,14 +58,19 @@ def extract_text_from_pdf(pdf_path: Path | str) -> str | None:
     """Extract raw text from a PDF, or None if nothing could be read."""
     
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PdfReader(f)
+        pdf = pdfium.PdfDocument(pdf_path) # PDFium (native C++) instead of pure-Python parsing
+        try:
             parts: list[str] = []
-            for page in reader.pages:
-                txt = page.extract_text()
+            for page in pdf:
+                textpage = page.get_textpage()
+                txt = textpage.get_text_range()
+                textpage.close()
+                page.close()
                 if txt:
                     parts.append(txt)
             return "\n".join(parts) if parts else None
+        finally:
+            pdf.close()
     except FileNotFoundError:
         raise
     except Exception as e:
@@ -1,16 +1,51 @@
 """JWT validation aligned with User Microservice settings (HS256 by secret)."""
 
+import time
+from collections import OrderedDict
 from jose import jwt, JWTError
 from .config import settings
 
+# Verified payloads keyed by raw token; entries expire with the token's own `exp` claim
+_TOKEN_CACHE_MAX = 1024
+_TOKEN_CACHE_TTL = 60.0
+_token_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+
+def _cache_get(token: str) -> dict | None:
+    """Return a cached payload if it has not expired, refreshing its LRU position."""
+    entry = _token_cache.get(token)
+    if entry is None:
+        return None
+    expires_at, payload = entry
+    if expires_at <= time.time():
+        _token_cache.pop(token, None)
+        return None
+    _token_cache.move_to_end(token)
+    return payload
+
+
+def _cache_put(token: str, payload: dict) -> None:
+    """Store a verified payload until min(exp, now + TTL), evicting the least recently used entry."""
+    expires_at = time.time() + _TOKEN_CACHE_TTL
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    _token_cache[token] = (expires_at, payload)
+    if len(_token_cache) > _TOKEN_CACHE_MAX:
+        _token_cache.popitem(last=False)
+
 
 def decode_access_token(token: str) -> dict:
     """Decode and verify JWT token, ensuring valid signature and 'sub' claim presence."""
+    cached = _cache_get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         # Ensure subject is present
         if not payload.get("sub"):
             raise ValueError("Missing subject (sub) in token")
-        return payload
     except JWTError as e:
         raise ValueError(f"Token validation failed: {str(e)}")
+    _cache_put(token, payload)
+    return payload
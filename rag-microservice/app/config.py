@@ -1,6 +1,7 @@
 """Configuration management for RAG Microservice using Pydantic Settings."""
 
 import os
+from functools import cached_property
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
@@ -51,6 +52,7 @@ class Settings(BaseSettings):
 
     # ==================== Models (LLM & Embeddings) ====================
     GEN_MODEL: str = os.getenv("GEN_MODEL", "llama3.1:8b")
+    EMB_MODEL: str = os.getenv("EMB_MODEL", "nomic-embed-text")  # must match the ingestion model
     NUM_CTX: int = int(os.getenv("NUM_CTX", "4096"))
     NUM_PREDICT: int = int(os.getenv("NUM_PREDICT", "512"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.25"))
@@ -58,7 +60,7 @@ class Settings(BaseSettings):
     # ==================== Vector DB ====================
     CHROMA_PATH: Path = Path(os.getenv("CHROMA_PATH", "../data/chroma_db")).resolve()
     CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME", "rag_docs")
-    CHROMA_DISTANCE: str = os.getenv("CHROMA_DISTANCE", "cosine")
+    CHROMA_DISTANCE: str = os.getenv("CHROMA_DISTANCE", "ip")
 
     # ==================== Retrieval ====================
     RETRIEVAL_K: int = int(os.getenv("RETRIEVAL_K", "2"))
@@ -84,9 +86,10 @@ class Settings(BaseSettings):
             raise ValueError("SECRET_KEY must be sufficiently long")
         return v
 
-    def get_cors_origins(self) -> list[str]:
-        """Parse comma-separated CORS origins into a list."""
-        return [o.strip() for o in self.CORS_ORIGINS.split(",") if o.strip()]
+    @cached_property
+    def cors_origins(self) -> tuple[str, ...]:
+        """Comma-separated CORS origins, parsed once per settings instance."""
+        return tuple(o.strip() for o in self.CORS_ORIGINS.split(",") if o.strip())
 
 
 settings = Settings()
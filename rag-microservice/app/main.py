@@ -14,6 +14,7 @@ from app.middleware import (
     set_shutdown_manager,
 )
 from app.monitoring import setup_monitoring
+from core.generator import close_client
 
 
 class GracefulShutdownManager:
@@ -42,6 +43,7 @@ async def lifespan(app: FastAPI):
         yield
     finally:
         shutdown_manager.is_shutting_down = True
+        await close_client()
         logger.info("RAG Service shutdown complete")
 
 
@@ -56,7 +58,7 @@ app.middleware("http")(security_headers_middleware)
 # CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.get_cors_origins(),
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
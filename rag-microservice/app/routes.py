@@ -1,8 +1,14 @@
 """FastAPI routes for the RAG microservice."""
 
+from collections.abc import AsyncIterator
+import httpx
+import ollama  # type: ignore
+import orjson
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel
 
 from app.schemas import QueryRequest, QueryResponse, DocumentMetadata, HealthCheckResponse
 from app.auth import decode_access_token
@@ -16,6 +22,39 @@ router = APIRouter(prefix="/v1")
 auth_scheme = HTTPBearer(auto_error=True)
 
 
+def _json_response(model: BaseModel) -> Response:
+    """Serialize an already-validated model straight to JSON bytes in pydantic-core."""
+    # Returning a Response skips FastAPI's response_model re-validation and jsonable_encoder pass;
+    # response_model stays on the route for the OpenAPI schema
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+async def _one_chunk(text: str) -> AsyncIterator[str]:
+    """Yield a fixed answer as a single stream chunk."""
+    yield text
+
+
+# Failures the Ollama stream can raise after headers are sent (dropped socket, timeout, server error)
+_STREAM_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError, ollama.ResponseError)
+
+
+async def _sse_stream(parts: AsyncIterator[str], summary: dict) -> AsyncIterator[bytes]:
+    """Frame answer chunks as Server-Sent Events, ending with a summary (or error) event."""
+    try:
+        async for part in parts:
+            yield b"data: " + orjson.dumps({"delta": part}) + b"\n\n"
+    except _STREAM_ERRORS as e:
+        # Headers are already sent, so the failure can only be reported in-band
+        logger.exception("Error while streaming /query: %s", e)
+        yield b"data: " + orjson.dumps({"error": "Internal server error"}) + b"\n\n"
+        return
+    yield b"data: " + orjson.dumps({"done": True, **summary}) + b"\n\n"
+
+
+def _sse_response(parts: AsyncIterator[str], summary: dict) -> StreamingResponse:
+    return StreamingResponse(_sse_stream(parts, summary), media_type="text/event-stream")
+
+
 async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(auth_scheme)) -> str:
     """Validate JWT token and extract user ID from 'sub' claim."""
     try:
@@ -38,14 +77,15 @@ async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(auth_sc
 async def rag_query(
     request: QueryRequest,
     user_id: str = Depends(get_current_user),
-) -> QueryResponse:
+) -> Response:
     """Retrieve top-k chunks from Chroma and generate an answer grounded in context."""
     logger.debug("User %s asked: %s", user_id, request.text)
     logger.info("User %s made a query", user_id)
     
     try:
+        # QueryRequest already bounds k (1-20) and min_similarity (0-1) inside the retriever's clamps
         results = await run_in_threadpool(
-            query_chroma, request.text, request.k, request.min_similarity
+            query_chroma, request.text, request.k, request.min_similarity, prevalidated=True
         )
 
         docs = results["documents"]
@@ -64,17 +104,23 @@ async def rag_query(
         if not docs:
             logger.debug("RAG query: no docs passed threshold (k=%s, min_sim=%s)",
                          request.k, request.min_similarity)
-            return QueryResponse(
+            stats = {
+                "retrieved_count": retrieved_count,
+                "filtered_count": 0,
+                "top_similarity": None
+            }
+            if request.stream:
+                return _sse_response(
+                    _one_chunk("No relevant documents found."),
+                    {"similarities": [], "metadata": [], "retrieval_stats": stats},
+                )
+            return _json_response(QueryResponse(
                 response="No relevant documents found.",
                 context_docs=[],
                 similarities=[],
                 metadata=[],
-                retrieval_stats={
-                    "retrieved_count": retrieved_count,
-                    "filtered_count": 0,
-                    "top_similarity": None
-                }
-            )
+                retrieval_stats=stats
+            ))
 
         # Build metadata response
         metadata_objs = [
@@ -88,33 +134,43 @@ async def rag_query(
 
         context = "\n\n".join(docs)
 
+        stats = {
+            "retrieved_count": retrieved_count,
+            "filtered_count": len(sims),
+            "top_similarity": top_similarity
+        }
+
         if request.stream:
-            gen_iter = await run_in_threadpool(
-                generate_response, request.text, context, max_tokens=request.max_tokens, stream=True
-            )
-            answer = "".join(part for part in gen_iter)
-        else:
-            answer = await run_in_threadpool(
-                generate_response, request.text, context, max_tokens=request.max_tokens, stream=False
+            # Stream-through: chunks go out as Ollama produces them instead of being joined first
+            gen_iter = await generate_response(
+                request.text, context, max_tokens=request.max_tokens, stream=True
             )
+            return _sse_response(gen_iter, {
+                "similarities": sims,
+                "metadata": [m.model_dump() for m in metadata_objs],
+                "retrieval_stats": stats,
+            })
+
+        answer = await generate_response(
+            request.text, context, max_tokens=request.max_tokens, stream=False
+        )
 
-        return QueryResponse(
+        return _json_response(QueryResponse(
             response=answer,
             context_docs=docs,
             similarities=sims,
             metadata=metadata_objs,
-            retrieval_stats={
-                "retrieved_count": retrieved_count,
-                "filtered_count": len(sims),
-                "top_similarity": top_similarity
-            }
-        )
+            retrieval_stats=stats
+        ))
 
     except Exception as e:
         # Catch upstream errors (Chroma, Ollama, etc.)
         logger.exception("Error during /query: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error") from e
 
+def _collection_count() -> int:
+    return get_chroma_collection().count()
+
 @router.get(
     "/health",
     response_model=HealthCheckResponse,
@@ -124,8 +180,8 @@ async def rag_query(
 async def health_check() -> HealthCheckResponse:
     """Health check endpoint returning service status and ChromaDB stats."""
     try:
-        col = await run_in_threadpool(get_chroma_collection)
-        count = await run_in_threadpool(col.count)
+        # One worker-thread hop for both blocking Chroma calls
+        count = await run_in_threadpool(_collection_count)
 
         return HealthCheckResponse(
             status="healthy",
@@ -1,9 +1,12 @@
 # Pydantic schemas for request/response validation
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Literal
 from app.config import settings
 
+# Metadata values Chroma can store; a concrete union lets pydantic-core specialize the dict validator
+MetadataValue = str | int | float | bool | None
+
 
 class QueryRequest(BaseModel):
     """Request schema for RAG query endpoint."""
@@ -26,10 +29,18 @@ class QueryRequest(BaseModel):
         le=2048,
         description="Max tokens to generate (1–2048).",
     )
-    stream: bool = Field(False, description="Concatenate streamed chunks into the response.")
+    stream: bool = Field(
+        False,
+        description=(
+            "Stream the answer as Server-Sent Events: `data: {\"delta\": ...}` per chunk, "
+            "then a final `data: {\"done\": true, ...}` event with similarities, metadata and retrieval_stats."
+        ),
+    )
 
-    model_config = {
-        "json_schema_extra": {
+    model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
+        json_schema_extra={
             "example": {
                 "text": "What are lions?",
                 "k": settings.RETRIEVAL_K,
@@ -37,14 +48,16 @@ class QueryRequest(BaseModel):
                 "max_tokens": settings.NUM_PREDICT,
                 "stream": False,
             }
-        }
-    }
+        },
+    )
 
 class DocumentMetadata(BaseModel):
     """Metadata for a retrieved document."""
     file: str | None = None
     source_path: str | None = None
-    extra: dict = Field(default_factory=dict, description="Additional metadata fields.")
+    extra: dict[str, MetadataValue] = Field(default_factory=dict, description="Additional metadata fields.")
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
 
 class QueryResponse(BaseModel):
     """Response schema for RAG query endpoint with retrieval and generation results."""
@@ -52,13 +65,15 @@ class QueryResponse(BaseModel):
     context_docs: list[str] = Field(..., description="Retrieved document chunks used for generation.")
     similarities: list[float] = Field(..., description="Similarity scores for retrieved documents.")
     metadata: list[DocumentMetadata] = Field(default_factory=list, description="Metadata for each retrieved document.")
-    retrieval_stats: dict = Field(
+    retrieval_stats: dict[str, int | float | None] = Field(
         default_factory=dict,
         description="Retrieval statistics: retrieved_count, filtered_count, top_similarity."
     )
 
-    model_config = {
-        "json_schema_extra": {
+    model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
+        json_schema_extra={
             "example": {
                 "response": "Lions are apex predators native to Africa's savannas.",
                 "context_docs": [
@@ -67,8 +82,8 @@ class QueryResponse(BaseModel):
                 ],
                 "similarities": [0.78, 0.54],
             }
-        }
-    }
+        },
+    )
 
 class HealthCheckResponse(BaseModel):
     """Health check response with service status and configuration details."""
@@ -77,3 +92,5 @@ class HealthCheckResponse(BaseModel):
     ctx: dict[str, int]
     retrieval: dict[str, str | int | float]
     error: str | None = None
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
@@ -1,61 +1,73 @@
 """Generate answers from query and context using Ollama LLM."""
 
-from collections.abc import Iterator, Iterable
+from collections.abc import AsyncIterable, AsyncIterator
+import asyncio
 import logging
-import time
+import httpx
 import ollama  # type: ignore
 from app.config import settings
 
 logger = logging.getLogger("rag_microservice.generator")
 
-# Initialize Ollama client with the configured host
-client = ollama.Client(host=settings.OLLAMA_HOST)
+# One pooled keep-alive AsyncClient per process, shared by all requests; closed from the app lifespan
+client = ollama.AsyncClient(
+    host=settings.OLLAMA_HOST,
+    timeout=httpx.Timeout(None, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
 
 # Retry configuration
 MAX_RETRIES = 3
 BASE_RETRY_DELAY = 0.5  # seconds
+# ollama maps only ConnectError to ConnectionError; a pooled keep-alive connection dropped by the
+# server surfaces as another httpx.TransportError (ReadError, RemoteProtocolError, timeouts)
+_RETRYABLE_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError, ollama.ResponseError)
+# Module-local alias so tests can skip backoff delays without patching asyncio globally
+_sleep = asyncio.sleep
+
+
+# Prompt pieces are fixed for the process lifetime, so build them once at import
+_INSTR_WITH_CONTEXT = (
+    "You are a helpful assistant. Answer strictly using the provided context. "
+    "If the context is insufficient, say you don't know or that the documents "
+    "do not contain the answer."
+)
+_INSTR_WITHOUT_CONTEXT = _INSTR_WITH_CONTEXT + " (Note: no context was provided.)"
+
+# Token-based context truncation to stay within context window limits
+# Estimate: ~1 token per word on average (conservative estimate)
+_MAX_CTX_TOKENS = max(64, int(settings.NUM_CTX * 0.65))
 
 
 def _build_prompt(query: str, context: str) -> str:
     """Construct a grounded prompt using provided context to avoid hallucinations."""
-    base_instr = (
-        "You are a helpful assistant. Answer strictly using the provided context. "
-        "If the context is insufficient, say you don't know or that the documents "
-        "do not contain the answer."
-    )
-    instructions = (
-        base_instr if context.strip()
-        else base_instr + " (Note: no context was provided.)"
-    )
+    instructions = _INSTR_WITH_CONTEXT if context.strip() else _INSTR_WITHOUT_CONTEXT
+    # maxsplit stops tokenizing after the budget; the untouched remainder is the last item and is dropped
+    ctx_snippet = " ".join(context.split(maxsplit=_MAX_CTX_TOKENS)[:_MAX_CTX_TOKENS])
+    return f"{instructions}\n\nContext:\n{ctx_snippet}\n\nQuestion: {query}\nAnswer:"
 
-    # Token-based context truncation to stay within context window limits
-    # Estimate: ~1 token per word on average (conservative estimate)
-    words = context.split()
-    max_context_tokens = max(64, int(settings.NUM_CTX * 0.65))
-    truncated_words = words[:max_context_tokens]
-    ctx_snippet = " ".join(truncated_words)
+async def close_client() -> None:
+    """Close the shared Ollama connection pool."""
+    await client.close()
 
-    return (
-        f"{instructions}\n\n"
-        f"Context:\n{ctx_snippet}\n\n"
-        f"Question: {query}\n"
-        f"Answer:"
-    )
-
-def _stream_generator(ollama_iter: Iterable[dict]) -> Iterator[str]:
+async def _stream_generator(ollama_iter: AsyncIterable[dict]) -> AsyncIterator[str]:
     """Yield only non-empty text chunks from Ollama's streaming iterator."""
-    for chunk in ollama_iter:
-        part = chunk.get("response", "")
+    # Every streamed chunk carries "response", so index it directly and only pay for the miss
+    async for chunk in ollama_iter:
+        try:
+            part = chunk["response"]
+        except KeyError:
+            continue
         if part:
             yield part
 
-def generate_response(
+async def generate_response(
     query: str,
     context: str,
     *,
     max_tokens: int = settings.NUM_PREDICT,
     stream: bool = False,
-) -> str | Iterator[str]:
+) -> str | AsyncIterator[str]:
     """Generate an answer from the LLM using the retrieved context.
     
     Implements exponential backoff retry logic for transient failures.
@@ -71,7 +83,7 @@ def generate_response(
     last_error = None
     for attempt in range(MAX_RETRIES):
         try:
-            resp = client.generate(
+            resp = await client.generate(
                 model=settings.GEN_MODEL,
                 prompt=prompt,
                 stream=stream,
@@ -81,7 +93,7 @@ def generate_response(
                 return _stream_generator(resp)
             return (resp.get("response") or "").strip()
         
-        except (ConnectionError, TimeoutError, ollama.ResponseError) as e:
+        except _RETRYABLE_ERRORS as e:
             last_error = e
             if attempt < MAX_RETRIES - 1:
                 delay = BASE_RETRY_DELAY * (2 ** attempt)
@@ -89,7 +101,7 @@ def generate_response(
                     "Ollama generation attempt %d/%d failed: %s. Retrying in %.2fs...",
                     attempt + 1, MAX_RETRIES, str(e), delay
                 )
-                time.sleep(delay)
+                await _sleep(delay)
             else:
                 logger.error(
                     "Ollama generation failed after %d attempts: %s",
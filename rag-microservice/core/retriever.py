@@ -4,8 +4,16 @@
    Returns best-matching text chunks + metadata, using embeddings.
 """
 
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
 import logging
+import sys
+import threading
+import time
 import chromadb  # type: ignore
+import numpy as np
+import ollama  # type: ignore
 from app.config import settings
 
 logger = logging.getLogger("rag_microservice.retriever")
@@ -15,8 +23,37 @@ _MAX_K: int = 50
 _MIN_SIM: float = 0.0
 _MAX_SIM: float = 1.0
 
+# Settings used on every query, resolved once at import instead of per-call pydantic attribute access
+_METRIC: str = settings.CHROMA_DISTANCE
+_DEFAULT_K: int = settings.RETRIEVAL_K
+_DEFAULT_MIN_SIM: float = settings.MIN_SIMILARITY
+_COLLECTION_NAME: str = settings.CHROMA_COLLECTION_NAME
+_EMB_MODEL: str = settings.EMB_MODEL
+
+# Chroma's "ip" space reports 1 - dot. Ingested and query vectors are both unit length, so that dot
+# is the cosine similarity and "ip" converts exactly like "cosine" (minus hnswlib's per-vector normalize)
+_SIMILARITY_FNS = {
+    "cosine": lambda arr: 1.0 - arr,
+    "ip": lambda arr: 1.0 - arr,
+    "l2": lambda arr: np.reciprocal(1.0 + arr),
+}
+_UNIT_RANGE_METRICS = frozenset({"cosine", "ip"})
+
+# Most queries a single Chroma call may carry; see _QueryBatcher
+_MAX_QUERY_BATCH: int = 32
+
+# Repeated (query, k, min_similarity) retrievals are served from memory for a bounded time
+_RETRIEVAL_CACHE_MAX: int = 1024
+_RETRIEVAL_CACHE_TTL: float = 60.0  # seconds
+
+# Metadata keys whose values repeat across every chunk of a source file
+_SHARED_META_KEYS = ("file", "source_path")
+
 _client = None
 _collection = None
+_embed_client = None
+_retrieval_cache: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+_retrieval_cache_lock = threading.Lock()
 
 
 def _client_cached():
@@ -26,50 +63,222 @@ def _client_cached():
         _client = chromadb.PersistentClient(path=str(settings.CHROMA_PATH))
     return _client
 
+def _embed_client_cached():
+    """Memoize a single Ollama client (keep-alive pool) for query embeddings."""
+    global _embed_client
+    if _embed_client is None:
+        _embed_client = ollama.Client(host=settings.OLLAMA_HOST)
+    return _embed_client
+
+def _embed_queries(texts: list[str]) -> np.ndarray:
+    """Embed query texts in one Ollama call, L2-normalized like the ingested chunk vectors."""
+    resp = _embed_client_cached().embed(model=_EMB_MODEL, input=texts)
+    arr = np.asarray(resp["embeddings"], dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    np.divide(arr, norms, out=arr, where=norms > 0)
+    return arr
+
 def get_chroma_collection():
     """Get the existing collection without modifying embedding function."""
     global _collection
     if _collection is None:
-        _collection = _client_cached().get_collection(settings.CHROMA_COLLECTION_NAME)
+        _collection = _client_cached().get_collection(_COLLECTION_NAME)
     return _collection
 
-def _distances_to_similarities(distances: list[float]) -> list[float]:
-    """Convert Chroma distances to similarity scores (higher = more similar)."""
-    if settings.CHROMA_DISTANCE == "cosine":
-        return [1.0 - d for d in distances]
-    elif settings.CHROMA_DISTANCE == "l2":
-        return [1.0 / (1.0 + d) for d in distances]
-    else:  # "ip"
-        return [-d for d in distances]
+@dataclass(slots=True)
+class _PendingQuery:
+    text: str
+    n_results: int
+    need_metadata: bool = True
+    done: threading.Event = field(default_factory=threading.Event)
+    lead: bool = False
+    result: dict | None = None
+    error: Exception | None = None
+
+class _QueryBatcher:
+    """Coalesce concurrent queries into one `collection.query` call (group-commit style).
+
+    A query arriving while none is in flight runs at once, so there is no added latency at low load.
+    Queries arriving while one is in flight queue up and all go out together in the next call.
+    """
+
+    def __init__(self, max_batch: int = _MAX_QUERY_BATCH):
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: list[_PendingQuery] = []
+        self._busy = False
+
+    def query(self, text: str, n_results: int, need_metadata: bool = True) -> dict:
+        """Return the Chroma result for a single query text, in single-query `collection.query` shape."""
+        pending = _PendingQuery(text, n_results, need_metadata)
+        with self._lock:
+            self._pending.append(pending)
+            lead = not self._busy
+            self._busy = True
+        if not lead:
+            pending.done.wait()
+            lead = pending.lead
+        if lead:
+            self._run_batch()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run_batch(self) -> None:
+        with self._lock:
+            batch = self._pending[:self._max_batch]
+            del self._pending[:self._max_batch]
+        try:
+            # Embed with the ingestion model ourselves; the collection is stored without an embedding function
+            result = get_chroma_collection().query(
+                query_embeddings=_embed_queries([p.text for p in batch]),
+                n_results=max(p.n_results for p in batch),
+                # Metadata marshaling is per-hit work; skip it unless someone in the batch wants it
+                include=_INCLUDE_WITH_META if any(p.need_metadata for p in batch) else _INCLUDE_NO_META,
+            )
+            docs_outer = result.get("documents") or []
+            dists_outer = result.get("distances") or []
+            metas_outer = result.get("metadatas") or []
+            for i, p in enumerate(batch):
+                # Hits come back nearest-first, so each caller's top-n is a prefix of its row
+                n = p.n_results
+                p.result = {
+                    "documents": [docs_outer[i][:n]] if i < len(docs_outer) else [],
+                    "distances": [dists_outer[i][:n]] if i < len(dists_outer) else [],
+                    "metadatas": [metas_outer[i][:n]] if i < len(metas_outer) else [],
+                }
+        except Exception as e:
+            # Callers re-raise and log at the route; note here which batch the failure hit
+            logger.debug("Chroma batch query failed for %d queries", len(batch), exc_info=True)
+            for p in batch:
+                p.error = e
+        finally:
+            # An interrupt (KeyboardInterrupt, SystemExit) propagates from the leader, but its
+            # waiters must still wake with an error rather than an empty result
+            for p in batch:
+                if p.result is None and p.error is None:
+                    p.error = RuntimeError("Query batch was interrupted")
+            # Hand leadership to the oldest queued query, or go idle
+            with self._lock:
+                nxt = self._pending[0] if self._pending else None
+                if nxt is not None:
+                    nxt.lead = True
+                else:
+                    self._busy = False
+            for p in batch:
+                p.done.set()
+            if nxt is not None:
+                nxt.done.set()
+
+_INCLUDE_WITH_META = ["documents", "distances", "metadatas"]
+_INCLUDE_NO_META = ["documents", "distances"]
+
+_batcher = _QueryBatcher()
+
+def _distances_to_similarities(distances, metric: str | None = None) -> np.ndarray:
+    """Convert Chroma distances to similarity scores (higher = more similar), vectorized.
+
+    `metric` defaults to the configured CHROMA_DISTANCE.
+    """
+    convert = _SIMILARITY_FNS.get(metric or _METRIC, np.negative)
+    return convert(np.asarray(distances, dtype=np.float64))
+
+def _rank_hits(sims: np.ndarray, min_sim: float) -> np.ndarray:
+    """Indices of hits with similarity >= min_sim, most similar first (stable on ties)."""
+    # Chroma returns each row nearest-first, so similarities are already descending and the
+    # threshold just cuts a prefix: one comparison pass and a binary search, no sort
+    if sims.size < 2 or bool((sims[:-1] >= sims[1:]).all()):
+        return np.arange(np.searchsorted(-sims, -min_sim, side="right"))
+    # Out-of-order rows (or NaNs): mask, then one stable argsort (descending) on the survivors
+    idx = np.flatnonzero(sims >= min_sim)
+    return idx[np.argsort(-sims[idx], kind="stable")]
 
 def _clamp_overrides(k: int | None, min_similarity: float | None) -> tuple[int, float]:
     """Apply config defaults and clamp to safe ranges."""
-    effective_k = settings.RETRIEVAL_K if k is None else int(k)
+    effective_k = _DEFAULT_K if k is None else int(k)
     effective_k = max(_MIN_K, min(_MAX_K, effective_k))
 
-    effective_min_sim = settings.MIN_SIMILARITY if min_similarity is None else float(min_similarity)
-    if settings.CHROMA_DISTANCE == "cosine":
+    effective_min_sim = _DEFAULT_MIN_SIM if min_similarity is None else float(min_similarity)
+    if _METRIC in _UNIT_RANGE_METRICS:
         effective_min_sim = max(_MIN_SIM, min(_MAX_SIM, effective_min_sim))
     else:
-        # "l2" and "ip" similarity
+        # "l2" similarity
         effective_min_sim = max(_MIN_SIM, effective_min_sim)
 
     return effective_k, effective_min_sim
 
+def _cache_key(query_text: str, k: int, min_sim: float, need_metadata: bool) -> tuple[bytes, int, float, bool]:
+    """Fixed-size key, so long query texts don't sit in the cache verbatim.
+
+    `min_sim` is keyed exactly: the cached result was filtered at that threshold.
+    """
+    return hashlib.blake2b(query_text.encode(), digest_size=16).digest(), k, min_sim, need_metadata
+
+def _share_meta(meta: dict | None) -> dict | None:
+    """Point per-file metadata strings at one interned copy shared by all of that file's chunks."""
+    if meta:
+        for key in _SHARED_META_KEYS:
+            val = meta.get(key)
+            if type(val) is str:
+                meta[key] = sys.intern(val)
+    return meta
+
+def _copy_result(result: dict) -> dict:
+    """Fresh outer lists, so callers can't mutate a cached entry."""
+    return {key: (val.copy() if isinstance(val, list) else val) for key, val in result.items()}
+
+def _cache_get(key: tuple) -> dict | None:
+    with _retrieval_cache_lock:
+        entry = _retrieval_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del _retrieval_cache[key]
+            return None
+        _retrieval_cache.move_to_end(key)
+    return _copy_result(result)
+
+def _cache_put(key: tuple, result: dict) -> None:
+    with _retrieval_cache_lock:
+        _retrieval_cache[key] = (time.monotonic() + _RETRIEVAL_CACHE_TTL, _copy_result(result))
+        _retrieval_cache.move_to_end(key)
+        if len(_retrieval_cache) > _RETRIEVAL_CACHE_MAX:
+            _retrieval_cache.popitem(last=False)
+
 def query_chroma(
     query_text: str,
     k: int | None = None,
     min_similarity: float | None = None,
+    need_metadata: bool = True,
+    *,
+    prevalidated: bool = False,
 ) -> dict[str, list]:
-    """Query Chroma by text and return top documents filtered by similarity."""
-    collection = get_chroma_collection()
-    effective_k, effective_min_sim = _clamp_overrides(k, min_similarity)
+    """Query Chroma by text and return top documents filtered by similarity (TTL-cached per query).
+
+    With need_metadata=False Chroma skips fetching metadata and each hit gets an empty dict.
+    Pass prevalidated=True only when k and min_similarity are already typed and within range
+    (e.g. from a validated QueryRequest); defaults and clamping are then skipped.
+    """
+    if prevalidated:
+        effective_k, effective_min_sim = k, min_similarity
+    else:
+        effective_k, effective_min_sim = _clamp_overrides(k, min_similarity)
+
+    key = _cache_key(query_text, effective_k, effective_min_sim, need_metadata)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
 
-    result = collection.query(
-        query_texts=[query_text],
-        n_results=effective_k,
-        include=["documents", "distances", "metadatas"],
-    )
+    result = _retrieve(query_text, effective_k, effective_min_sim, need_metadata)
+    _cache_put(key, result)
+    return result
+
+def _retrieve(
+    query_text: str, effective_k: int, effective_min_sim: float, need_metadata: bool
+) -> dict[str, list]:
+    """Run one (batched) Chroma query and rank/filter its hits."""
+    result = _batcher.query(query_text, effective_k, need_metadata)
 
     docs_outer = result.get("documents", [])
     dists_outer = result.get("distances", [])
@@ -80,14 +289,14 @@ def query_chroma(
             "RAG retrieval: collection empty or no hits | k=%s min_sim=%.3f metric=%s",
             effective_k,
             effective_min_sim,
-            settings.CHROMA_DISTANCE,
+            _METRIC,
         )
         return {
             "documents": [],
             "similarities": [],
             "metadatas": [],
             "raw_distances": [],
-            "metric": settings.CHROMA_DISTANCE,
+            "metric": _METRIC,
         }
 
     documents = docs_outer[0]
@@ -104,54 +313,48 @@ def query_chroma(
         distances = distances[:n]
         metadatas = metadatas[:n]
 
-    similarities = _distances_to_similarities(distances)
-
-    ranked = sorted(
-        zip(documents, similarities, metadatas, distances),
-        key=lambda x: x[1],
-        reverse=True,
-    )
-
-    kept_docs: list[str] = []
-    kept_sims: list[float] = []
-    kept_meta: list[dict] = []
-    kept_dists: list[float] = []
-
-    for doc, sim, meta, dist in ranked:
-        if sim >= effective_min_sim:
-            kept_docs.append(doc)
-            kept_sims.append(sim)
-            kept_meta.append(meta)
-            kept_dists.append(dist)
-
-    if not kept_docs:
-        top_preview = [
-            {
-                "sim": s,
-                "dist": d,
-                "file": (m or {}).get("file"),
-                "source_path": (m or {}).get("source_path"),
-            }
-            for _, s, m, d in ranked[:3]
-        ]
-        logger.debug(
-            "RAG retrieval: 0 docs passed threshold | k=%s min_sim=%.3f metric=%s top_preview=%s",
-            effective_k,
-            effective_min_sim,
-            settings.CHROMA_DISTANCE,
-            top_preview,
-        )
-    else:
-        logger.debug(
-            "RAG retrieval: kept=%s / %s (k=%s, min_sim=%.3f, metric=%s)",
-            len(kept_docs), len(ranked), effective_k, effective_min_sim, settings.CHROMA_DISTANCE
-        )
+    dists = np.asarray(distances, dtype=np.float64)
+    sims = _distances_to_similarities(dists)
+
+    order = _rank_hits(sims, effective_min_sim)
+
+    # Float columns are gathered with fancy indexing; only the object columns need a Python pass
+    kept_sims = sims[order].tolist()
+    kept_dists = dists[order].tolist()
+    order_list = order.tolist()
+    kept_docs = [documents[i] for i in order_list]
+    kept_meta = [_share_meta(metadatas[i]) for i in order_list]
+
+    # The preview (an argsort plus dict building) only exists for the debug log, so skip it unless DEBUG is on
+    if logger.isEnabledFor(logging.DEBUG):
+        if not kept_docs:
+            top_preview = [
+                {
+                    "sim": float(sims[i]),
+                    "dist": distances[i],
+                    "file": (metadatas[i] or {}).get("file"),
+                    "source_path": (metadatas[i] or {}).get("source_path"),
+                }
+                for i in np.argsort(-sims, kind="stable")[:3].tolist()
+            ]
+            logger.debug(
+                "RAG retrieval: 0 docs passed threshold | k=%s min_sim=%.3f metric=%s top_preview=%s",
+                effective_k,
+                effective_min_sim,
+                _METRIC,
+                top_preview,
+            )
+        else:
+            logger.debug(
+                "RAG retrieval: kept=%s / %s (k=%s, min_sim=%.3f, metric=%s)",
+                len(kept_docs), n, effective_k, effective_min_sim, _METRIC
+            )
 
     return {
         "documents": kept_docs,
         "similarities": kept_sims,
         "metadatas": kept_meta,
         "raw_distances": kept_dists,
-        "metric": settings.CHROMA_DISTANCE,
+        "metric": _METRIC,
     }
     
\ No newline at end of file
@@ -24,47 +24,131 @@ from jose import jwt
 
 from app.main import app
 
+# Signing key/algorithm resolved once for every token fixture
+_JWT_KEY = os.environ["JWT_SECRET_KEY"]
+_JWT_ALG = "HS256"
 
-@pytest_asyncio.fixture
+# query_chroma result with no hits; mock_rag overlays only the fields a test sets
+_EMPTY_RETRIEVAL = {"documents": [], "similarities": [], "metadatas": [], "raw_distances": []}
+
+
+@pytest_asyncio.fixture(scope="session")
 async def client():
-    """Create an async HTTP client for testing the FastAPI app."""
+    """Create one async HTTP client for the FastAPI app, shared by the whole session."""
+    # In-process ASGI transport; trust_env=False skips proxy/.netrc lookups that never apply here
     async with AsyncClient(
         transport=ASGITransport(app=app),
-        base_url="http://test"
+        base_url="http://test",
+        trust_env=False,
     ) as ac:
         yield ac
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def valid_token():
-    """Generate a valid JWT access token for testing."""
+    """Sign a valid JWT access token once per session; it expires long after any test run."""
     payload = {
         "sub": "test-user-123",
         "email": "test@example.com",
-        "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+        "exp": datetime.now(timezone.utc) + timedelta(days=3650)
     }
-    return jwt.encode(payload, os.environ["JWT_SECRET_KEY"], algorithm="HS256")
+    return jwt.encode(payload, _JWT_KEY, algorithm=_JWT_ALG)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expired_token():
-    """Generate an expired JWT token for testing."""
+    """Sign an expired JWT token once per session (exp at the epoch stays expired)."""
     payload = {
         "sub": "test-user-123",
         "email": "test@example.com",
-        "exp": datetime.now(timezone.utc) - timedelta(hours=1)
+        "exp": 1
     }
-    return jwt.encode(payload, os.environ["JWT_SECRET_KEY"], algorithm="HS256")
+    return jwt.encode(payload, _JWT_KEY, algorithm=_JWT_ALG)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def token_missing_sub():
-    """Generate a JWT token without 'sub' claim for testing."""
+    """Sign a JWT token without 'sub' claim once per session."""
     payload = {
         "email": "test@example.com",
-        "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+        "exp": datetime.now(timezone.utc) + timedelta(days=3650)
     }
-    return jwt.encode(payload, os.environ["JWT_SECRET_KEY"], algorithm="HS256")
+    return jwt.encode(payload, _JWT_KEY, algorithm=_JWT_ALG)
+
+
+@pytest.fixture
+def mock_rag(monkeypatch):
+    """Stub retrieval and generation behind /query; install() returns the recorded query_chroma calls.
+
+    Keyword fields (documents=..., similarities=...) fill in an empty query_chroma result;
+    passing an exception as `retrieval` or `answer` makes that stage raise it.
+    """
+    calls = []
+
+    def install(retrieval=None, answer="answer", **fields):
+        result = retrieval if retrieval is not None else {**_EMPTY_RETRIEVAL, **fields}
+
+        def _query_chroma(*args, **kwargs):
+            calls.append((args, kwargs))
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        async def _generate_response(*args, **kwargs):
+            if isinstance(answer, BaseException):
+                raise answer
+            return answer
+
+        monkeypatch.setattr("app.routes.query_chroma", _query_chroma)
+        monkeypatch.setattr("app.routes.generate_response", _generate_response)
+        return calls
+
+    return install
+
+
+@pytest.fixture
+def gen_settings(monkeypatch):
+    """Pin the generation settings generate_response reads; keyword overrides win."""
+    def apply(**overrides):
+        values = {"NUM_CTX": 4096, "NUM_PREDICT": 512, "TEMPERATURE": 0.25, "GEN_MODEL": "llama3.1:8b"}
+        for name, value in {**values, **overrides}.items():
+            monkeypatch.setattr(f"core.generator.settings.{name}", value)
+
+    return apply
+
+
+@pytest.fixture
+def fake_generate(monkeypatch):
+    """Replace the Ollama client's generate with a stub replaying `outcomes` (exceptions are raised).
+
+    The last outcome repeats once the others are used up; install() returns the list of call kwargs.
+    """
+    def install(*outcomes):
+        calls = []
+
+        async def _generate(**kwargs):
+            outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+            calls.append(kwargs)
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+
+        monkeypatch.setattr("core.generator.client.generate", _generate)
+        return calls
+
+    return install
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    """Record generate_response's backoff delays instead of sleeping through them."""
+    recorded = []
+
+    async def _sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr("core.generator._sleep", _sleep)
+    return recorded
 
 
 @pytest.fixture
@@ -77,9 +161,9 @@ def sample_query_request():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_retrieval_results():
-    """Sample ChromaDB retrieval results."""
+    """Sample ChromaDB retrieval results (read-only, built once per module)."""
     return {
         "ids": [["doc1", "doc2"]],
         "documents": [[
@@ -1,7 +1,9 @@
 """Unit tests for JWT authentication."""
 
 import pytest
+from unittest.mock import Mock
 from jose import jwt
+from app import auth
 from app.auth import decode_access_token
 
 
@@ -46,3 +48,28 @@ def test_decode_empty_token():
     """Test decoding empty token raises ValueError."""
     with pytest.raises(ValueError, match="Token validation failed"):
         decode_access_token("")
+
+
+def test_decode_cached_token_skips_verification(monkeypatch, valid_token):
+    """Test a verified token is served from cache on repeat calls."""
+    first = decode_access_token(valid_token)
+    mock_decode = Mock()
+    monkeypatch.setattr(auth, "jwt", Mock(decode=mock_decode))
+
+    second = decode_access_token(valid_token)
+
+    mock_decode.assert_not_called()
+    assert second == first
+
+
+def test_decode_cached_token_expires(monkeypatch, valid_token):
+    """Test a cached token is re-verified once its cache entry expires."""
+    decode_access_token(valid_token)
+    _, payload = auth._token_cache[valid_token]
+    auth._token_cache[valid_token] = (0.0, payload)
+    mock_decode = Mock(return_value=payload)
+    monkeypatch.setattr(auth, "jwt", Mock(decode=mock_decode))
+
+    decode_access_token(valid_token)
+
+    mock_decode.assert_called_once()
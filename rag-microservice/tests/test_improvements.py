@@ -7,396 +7,291 @@ Tests for:
 - Streaming format validation
 """
 
+import httpx
+import orjson
 import pytest
-from unittest.mock import patch
-from core.generator import generate_response, MAX_RETRIES
+from pydantic import ValidationError
+from app.routes import _sse_stream
+from app.schemas import QueryRequest
+from core.generator import generate_response, BASE_RETRY_DELAY, MAX_RETRIES
+
+
+async def _aiter(items):
+    """Wrap a list as an async iterator, like Ollama's streaming response."""
+    for item in items:
+        yield item
+
+
+def _json(response):
+    """Decode a response body with orjson."""
+    return orjson.loads(response.content)
+
+
+def _headers(token):
+    """Auth plus content-type headers for posting a pre-encoded JSON body."""
+    return {"Authorization": f"Bearer {token}", "content-type": "application/json"}
+
+
+# One retrieved chunk from test.pdf, as returned by query_chroma
+_TEST_PDF_HIT = {
+    "documents": ["test doc"],
+    "similarities": [0.85],
+    "metadatas": [{"file": "test.pdf", "source_path": "test.pdf"}],
+    "raw_distances": [0.15],
+}
+
+# Request bodies are encoded once at import and posted as raw bytes
+_VALID_FIELDS = {"text": "test", "k": 5, "min_similarity": 0.65, "max_tokens": 512}
+_K1_BODY = orjson.dumps({**_VALID_FIELDS, "k": 1})
+_K20_BODY = orjson.dumps({**_VALID_FIELDS, "k": 20})
+_K1_TEXT_BODY = orjson.dumps({"text": "test", "k": 1})
+_K5_TEXT_BODY = orjson.dumps({"text": "test", "k": 5})
+_NO_MATCH_BODY = orjson.dumps({"text": "nonexistent topic", "k": 5})
+_STREAM_BODY = orjson.dumps({"text": "test", "stream": True})
+_MIN_BODY = orjson.dumps({"text": "test"})
 
 
 # ==================== INPUT VALIDATION BOUNDARY TESTS ====================
 
+@pytest.mark.parametrize(
+    "body",
+    [
+        orjson.dumps({**_VALID_FIELDS, "k": 0}),  # Below minimum (1)
+        orjson.dumps({**_VALID_FIELDS, "k": 21}),  # Above maximum (20)
+        orjson.dumps({**_VALID_FIELDS, "min_similarity": -0.1}),  # Below minimum (0.0)
+        orjson.dumps({**_VALID_FIELDS, "min_similarity": 1.1}),  # Above maximum (1.0)
+        orjson.dumps({**_VALID_FIELDS, "max_tokens": 0}),  # Below minimum (1)
+        orjson.dumps({**_VALID_FIELDS, "max_tokens": 2049}),  # Above maximum (2048)
+    ],
+    ids=["k_low", "k_high", "sim_low", "sim_high", "tok_low", "tok_high"],
+)
+def test_query_request_out_of_range_rejected(body):
+    """Test QueryRequest rejects k, min_similarity or max_tokens outside its bounds."""
+    with pytest.raises(ValidationError):
+        QueryRequest.model_validate_json(body)
+
+
 @pytest.mark.asyncio
-async def test_query_k_below_minimum(client, valid_token):
-    """Test query with k < 1 is rejected."""
+async def test_query_out_of_range_returns_422(client, valid_token):
+    """Test the route surfaces QueryRequest validation errors as 422."""
     response = await client.post(
         "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 0,  # Below minimum (1)
-            "min_similarity": 0.65,
-            "max_tokens": 512
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
+        content=orjson.dumps({**_VALID_FIELDS, "k": 21}),
+        headers=_headers(valid_token)
     )
     
     assert response.status_code == 422  # Validation error
 
 
 @pytest.mark.asyncio
-async def test_query_k_above_maximum(client, valid_token):
-    """Test query with k > 20 is rejected."""
+@pytest.mark.parametrize("body", [_K1_BODY, _K20_BODY], ids=["k_min", "k_max"])
+async def test_query_k_at_boundaries(client, valid_token, mock_rag, body):
+    """Test query with k at valid boundaries (1 and 20) accepted."""
+    mock_rag(**_TEST_PDF_HIT, answer="test answer")
+    
     response = await client.post(
         "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 21,  # Above maximum (20)
-            "min_similarity": 0.65,
-            "max_tokens": 512
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
+        content=body,
+        headers=_headers(valid_token)
     )
-    
-    assert response.status_code == 422  # Validation error
+    assert response.status_code == 200
+
 
+# ==================== RESPONSE STRUCTURE TESTS ====================
 
 @pytest.mark.asyncio
-async def test_query_similarity_below_minimum(client, valid_token):
-    """Test query with min_similarity < 0.0 is rejected."""
+async def test_query_response_includes_metadata(client, valid_token, mock_rag):
+    """Test query response includes document metadata."""
+    mock_rag(
+        documents=["Lions are apex predators"],
+        similarities=[0.85],
+        metadatas=[{"file": "animals.pdf", "source_path": "data/animals.pdf", "chunk_index": 0}],
+        raw_distances=[0.15],
+        answer="Lions are large cats.",
+    )
+    
     response = await client.post(
         "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 5,
-            "min_similarity": -0.1,  # Below minimum (0.0)
-            "max_tokens": 512
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
+        content=_K1_TEXT_BODY,
+        headers=_headers(valid_token)
     )
     
-    assert response.status_code == 422  # Validation error
+    assert response.status_code == 200
+    data = _json(response)
+    
+    # Verify metadata structure
+    assert "metadata" in data
+    assert isinstance(data["metadata"], list)
+    assert len(data["metadata"]) == 1
+    
+    metadata = data["metadata"][0]
+    assert metadata["file"] == "animals.pdf"
+    assert metadata["source_path"] == "data/animals.pdf"
+    assert "extra" in metadata
+    assert metadata["extra"]["chunk_index"] == 0
 
 
 @pytest.mark.asyncio
-async def test_query_similarity_above_maximum(client, valid_token):
-    """Test query with min_similarity > 1.0 is rejected."""
+async def test_query_response_includes_retrieval_stats(client, valid_token, mock_rag):
+    """Test query response includes retrieval statistics."""
+    # Simulate retrieval that filtered results
+    mock_rag(**_TEST_PDF_HIT)
+    
     response = await client.post(
         "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 5,
-            "min_similarity": 1.1,  # Above maximum (1.0)
-            "max_tokens": 512
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
+        content=_K5_TEXT_BODY,
+        headers=_headers(valid_token)
     )
     
-    assert response.status_code == 422  # Validation error
+    assert response.status_code == 200
+    data = _json(response)
+    
+    # Verify retrieval_stats structure
+    assert "retrieval_stats" in data
+    stats = data["retrieval_stats"]
+    assert "retrieved_count" in stats
+    assert "filtered_count" in stats
+    assert "top_similarity" in stats
+    assert stats["filtered_count"] > 0
+    assert 0.0 <= stats["top_similarity"] <= 1.0
 
 
 @pytest.mark.asyncio
-async def test_query_max_tokens_below_minimum(client, valid_token):
-    """Test query with max_tokens < 1 is rejected."""
+async def test_query_response_no_results_has_stats(client, valid_token, mock_rag):
+    """Test that no-results response still includes retrieval stats."""
+    mock_rag()  # Return no matching documents
+    
     response = await client.post(
         "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 5,
-            "min_similarity": 0.65,
-            "max_tokens": 0  # Below minimum (1)
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
+        content=_NO_MATCH_BODY,
+        headers=_headers(valid_token)
     )
     
-    assert response.status_code == 422  # Validation error
+    assert response.status_code == 200
+    data = _json(response)
+    
+    # Verify response structure even with no results
+    assert "response" in data
+    assert "No relevant documents found" in data["response"]
+    assert "retrieval_stats" in data
+    assert data["retrieval_stats"]["filtered_count"] == 0
+    assert data["retrieval_stats"]["top_similarity"] is None
 
 
+# ==================== RETRY LOGIC TESTS ====================
+
 @pytest.mark.asyncio
-async def test_query_max_tokens_above_maximum(client, valid_token):
-    """Test query with max_tokens > 2048 is rejected."""
-    response = await client.post(
-        "/api/v1/query",
-        json={
-            "text": "test",
-            "k": 5,
-            "min_similarity": 0.65,
-            "max_tokens": 2049  # Above maximum (2048)
-        },
-        headers={"Authorization": f"Bearer {valid_token}"}
-    )
+@pytest.mark.parametrize(
+    "outcomes,expect_calls,expect_raises",
+    [
+        # Succeeds without retries
+        ([{"response": "test answer"}], 1, None),
+        # Fails twice on connection errors, succeeds on third attempt
+        ([ConnectionError("Connection failed")] * 2 + [{"response": "test answer"}], 3, None),
+        # Pooled connection dropped mid-request
+        ([httpx.RemoteProtocolError("Server disconnected"), {"response": "test answer"}], 2, None),
+        # Exhausts MAX_RETRIES attempts
+        ([ConnectionError("Connection failed")], MAX_RETRIES, ConnectionError),
+    ],
+    ids=["first_attempt", "connection_error", "dropped_connection", "max_retries"],
+)
+async def test_generate_response_retries(
+    gen_settings, fake_generate, fast_retry, outcomes, expect_calls, expect_raises
+):
+    """Test generate_response retries transient failures until success or MAX_RETRIES."""
+    gen_settings()
+    calls = fake_generate(*outcomes)
     
-    assert response.status_code == 422  # Validation error
+    if expect_raises:
+        with pytest.raises(expect_raises):
+            await generate_response("query", "context")
+    else:
+        assert await generate_response("query", "context") == "test answer"
+    
+    assert len(calls) == expect_calls
 
 
 @pytest.mark.asyncio
-async def test_query_k_at_boundaries(client, valid_token):
-    """Test query with k at valid boundaries (1 and 20) accepted."""
-    # This test assumes mock retrieval works
-    with patch("app.routes.query_chroma") as mock_retriever:
-        mock_retriever.return_value = {
-            "documents": ["test doc"],
-            "similarities": [0.8],
-            "metadatas": [{"file": "test.pdf", "source_path": "test.pdf"}],
-            "raw_distances": [0.2]
-        }
-        
-        with patch("app.routes.generate_response") as mock_gen:
-            mock_gen.return_value = "test answer"
-            
-            # Test k=1
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test", "k": 1, "min_similarity": 0.65, "max_tokens": 512},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            assert response.status_code == 200
-            
-            # Test k=20
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test", "k": 20, "min_similarity": 0.65, "max_tokens": 512},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            assert response.status_code == 200
+async def test_generate_response_exponential_backoff(gen_settings, fake_generate, fast_retry):
+    """Test generate_response uses exponential backoff for retries."""
+    gen_settings()
+    fake_generate(ConnectionError("Connection failed"))
+    
+    with pytest.raises(ConnectionError):
+        await generate_response("query", "context")
+    
+    # One backoff per retry, doubling from BASE_RETRY_DELAY (0.5, 1.0, ...)
+    assert fast_retry == [BASE_RETRY_DELAY * 2 ** i for i in range(MAX_RETRIES - 1)]
 
 
-# ==================== RESPONSE STRUCTURE TESTS ====================
+# ==================== STREAMING FORMAT VALIDATION ====================
 
-@pytest.mark.asyncio
-async def test_query_response_includes_metadata(client, valid_token):
-    """Test query response includes document metadata."""
-    with patch("app.routes.query_chroma") as mock_retriever:
-        mock_retriever.return_value = {
-            "documents": ["Lions are apex predators"],
-            "similarities": [0.85],
-            "metadatas": [{"file": "animals.pdf", "source_path": "data/animals.pdf", "chunk_index": 0}],
-            "raw_distances": [0.15]
-        }
-        
-        with patch("app.routes.generate_response") as mock_gen:
-            mock_gen.return_value = "Lions are large cats."
-            
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test", "k": 1},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            # Verify metadata structure
-            assert "metadata" in data
-            assert isinstance(data["metadata"], list)
-            assert len(data["metadata"]) == 1
-            
-            metadata = data["metadata"][0]
-            assert metadata["file"] == "animals.pdf"
-            assert metadata["source_path"] == "data/animals.pdf"
-            assert "extra" in metadata
-            assert metadata["extra"]["chunk_index"] == 0
+def _sse_events(raw):
+    """Parse `data: {...}` Server-Sent Events into a list of payloads."""
+    return [orjson.loads(event[len(b"data: "):]) for event in raw.split(b"\n\n") if event]
 
 
 @pytest.mark.asyncio
-async def test_query_response_includes_retrieval_stats(client, valid_token):
-    """Test query response includes retrieval statistics."""
-    with patch("app.routes.query_chroma") as mock_retriever:
-        # Simulate retrieval that filtered results
-        mock_retriever.return_value = {
-            "documents": ["filtered doc"],
-            "similarities": [0.8],
-            "metadatas": [{"file": "test.pdf", "source_path": "test.pdf"}],
-            "raw_distances": [0.2]
-        }
-        
-        with patch("app.routes.generate_response") as mock_gen:
-            mock_gen.return_value = "answer"
-            
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test", "k": 5},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            # Verify retrieval_stats structure
-            assert "retrieval_stats" in data
-            stats = data["retrieval_stats"]
-            assert "retrieved_count" in stats
-            assert "filtered_count" in stats
-            assert "top_similarity" in stats
-            assert stats["filtered_count"] > 0
-            assert 0.0 <= stats["top_similarity"] <= 1.0
+async def test_sse_stream_frames_chunks_unit():
+    """Test each chunk becomes one delta event, in order, followed by the summary event."""
+    chunks = ["Hello", " ", "world", "!"]
+    
+    raw = b"".join([frame async for frame in _sse_stream(_aiter(chunks), {"similarities": [0.9]})])
+    events = _sse_events(raw)
+    
+    assert [e["delta"] for e in events[:-1]] == chunks
+    assert events[-1] == {"done": True, "similarities": [0.9]}
 
 
 @pytest.mark.asyncio
-async def test_query_response_no_results_has_stats(client, valid_token):
-    """Test that no-results response still includes retrieval stats."""
-    with patch("app.routes.query_chroma") as mock_retriever:
-        # Return no matching documents
-        mock_retriever.return_value = {
-            "documents": [],
-            "similarities": [],
-            "metadatas": [],
-            "raw_distances": []
-        }
-        
-        response = await client.post(
-            "/api/v1/query",
-            json={"text": "nonexistent topic", "k": 5},
-            headers={"Authorization": f"Bearer {valid_token}"}
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        
-        # Verify response structure even with no results
-        assert "response" in data
-        assert "No relevant documents found" in data["response"]
-        assert "retrieval_stats" in data
-        assert data["retrieval_stats"]["filtered_count"] == 0
-        assert data["retrieval_stats"]["top_similarity"] is None
-
-
-# ==================== RETRY LOGIC TESTS ====================
-
-def test_generate_response_succeeds_on_first_attempt():
-    """Test generate_response succeeds without retries."""
-    with patch("core.generator.settings") as mock_settings:
-        mock_settings.NUM_CTX = 4096
-        mock_settings.NUM_PREDICT = 512
-        mock_settings.TEMPERATURE = 0.25
-        mock_settings.GEN_MODEL = "llama3.1:8b"
-        
-        mock_response = {"response": "test answer"}
-        
-        with patch("core.generator.client.generate", return_value=mock_response) as mock_gen:
-            result = generate_response("query", "context")
-            
-            assert result == "test answer"
-            # Should only call once if successful
-            assert mock_gen.call_count == 1
-
-
-def test_generate_response_retries_on_connection_error():
-    """Test generate_response retries on connection failures."""
-    with patch("core.generator.settings") as mock_settings:
-        mock_settings.NUM_CTX = 4096
-        mock_settings.NUM_PREDICT = 512
-        mock_settings.TEMPERATURE = 0.25
-        mock_settings.GEN_MODEL = "llama3.1:8b"
-        
-        # Fail twice, succeed on third attempt
-        mock_response = {"response": "test answer"}
-        
-        with patch("core.generator.client.generate") as mock_gen:
-            mock_gen.side_effect = [
-                ConnectionError("Connection failed"),
-                ConnectionError("Connection failed"),
-                mock_response
-            ]
-            
-            with patch("core.generator.time.sleep"):  # Skip actual sleep delays
-                result = generate_response("query", "context")
-            
-            assert result == "test answer"
-            # Should have retried twice before succeeding
-            assert mock_gen.call_count == 3
-
-
-def test_generate_response_fails_after_max_retries():
-    """Test generate_response fails after exhausting retries."""
-    with patch("core.generator.settings") as mock_settings:
-        mock_settings.NUM_CTX = 4096
-        mock_settings.NUM_PREDICT = 512
-        mock_settings.TEMPERATURE = 0.25
-        mock_settings.GEN_MODEL = "llama3.1:8b"
-        
-        with patch("core.generator.client.generate") as mock_gen:
-            mock_gen.side_effect = ConnectionError("Connection failed")
-            
-            with patch("core.generator.time.sleep"):  # Skip actual sleep delays
-                with pytest.raises(ConnectionError):
-                    generate_response("query", "context")
-            
-            # Should have attempted MAX_RETRIES times
-            assert mock_gen.call_count == MAX_RETRIES
-
-
-def test_generate_response_exponential_backoff():
-    """Test generate_response uses exponential backoff for retries."""
-    with patch("core.generator.settings") as mock_settings:
-        mock_settings.NUM_CTX = 4096
-        mock_settings.NUM_PREDICT = 512
-        mock_settings.TEMPERATURE = 0.25
-        mock_settings.GEN_MODEL = "llama3.1:8b"
-        
-        with patch("core.generator.client.generate") as mock_gen:
-            mock_gen.side_effect = ConnectionError("Connection failed")
-            
-            with patch("core.generator.time.sleep") as mock_sleep:
-                with pytest.raises(ConnectionError):
-                    generate_response("query", "context")
-                
-                # Should have called sleep with exponential delays
-                # 1st retry: 0.5 * 2^0 = 0.5
-                # 2nd retry: 0.5 * 2^1 = 1.0
-                sleep_calls = [call[0][0] for call in mock_sleep.call_args_list]
-                
-                assert len(sleep_calls) == MAX_RETRIES - 1
-                # Verify exponential pattern
-                assert abs(sleep_calls[0] - 0.5) < 0.01
-                assert abs(sleep_calls[1] - 1.0) < 0.01
-
+async def test_sse_stream_reports_generation_error_unit():
+    """Test a failure mid-stream ends the stream with an error event instead of a summary."""
+    async def _failing():
+        yield "Hello"
+        raise ConnectionError("Ollama went away")
+    
+    raw = b"".join([frame async for frame in _sse_stream(_failing(), {"similarities": []})])
+    
+    assert _sse_events(raw) == [{"delta": "Hello"}, {"error": "Internal server error"}]
 
-# ==================== STREAMING FORMAT VALIDATION ====================
 
 @pytest.mark.asyncio
-async def test_query_streaming_enabled_returns_full_response(client, valid_token):
-    """Test that stream=true still returns complete response (not streamed chunks)."""
-    with patch("app.routes.query_chroma") as mock_retriever:
-        mock_retriever.return_value = {
-            "documents": ["test doc"],
-            "similarities": [0.85],
-            "metadatas": [{"file": "test.pdf", "source_path": "test.pdf"}],
-            "raw_distances": [0.15]
-        }
-        
-        # Simulate streaming chunks that get concatenated
-        chunks = ["Hello", " ", "world", "!"]
-        
-        with patch("app.routes.generate_response") as mock_gen:
-            mock_gen.return_value = iter(chunks)  # Return iterator for streaming
-            
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test", "stream": True},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            # Should have concatenated all chunks
-            assert data["response"] == "Hello world!"
-            # Should still include metadata and stats
-            assert "metadata" in data
-            assert "retrieval_stats" in data
+async def test_query_streaming_enabled_streams_sse_events(client, valid_token, mock_rag):
+    """Test that stream=true is served as SSE, ending with a summary event."""
+    # Framing per chunk is covered by the unit tests above
+    mock_rag(**_TEST_PDF_HIT, answer=_aiter(["Hello world!"]))
+    
+    response = await client.post(
+        "/api/v1/query",
+        content=_STREAM_BODY,
+        headers=_headers(valid_token)
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.content)
+    
+    assert events[0] == {"delta": "Hello world!"}
+    # Final event carries metadata and stats
+    assert events[-1]["done"] is True
+    assert events[-1]["metadata"][0]["file"] == "test.pdf"
+    assert events[-1]["retrieval_stats"]["filtered_count"] == 1
 
 
 @pytest.mark.asyncio
-async def test_query_non_streaming_default(client, valid_token):
+async def test_query_non_streaming_default(client, valid_token, mock_rag):
     """Test that stream=false (default) returns complete response."""
-    with patch("app.routes.query_chroma") as mock_retriever:
-        mock_retriever.return_value = {
-            "documents": ["test doc"],
-            "similarities": [0.85],
-            "metadatas": [{"file": "test.pdf", "source_path": "test.pdf"}],
-            "raw_distances": [0.15]
-        }
-        
-        with patch("app.routes.generate_response") as mock_gen:
-            mock_gen.return_value = "complete response"
-            
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test"},  # stream not specified, defaults to False
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            
-            assert data["response"] == "complete response"
-            assert "metadata" in data
-            assert "retrieval_stats" in data
+    mock_rag(**_TEST_PDF_HIT, answer="complete response")
+    
+    response = await client.post(
+        "/api/v1/query",
+        content=_MIN_BODY,  # stream not specified, defaults to False
+        headers=_headers(valid_token)
+    )
+    
+    assert response.status_code == 200
+    data = _json(response)
+    
+    assert data["response"] == "complete response"
+    assert "metadata" in data
+    assert "retrieval_stats" in data
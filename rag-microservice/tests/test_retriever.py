@@ -1,170 +1,291 @@
 """Unit tests for document retrieval logic."""
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import Mock
+from core import retriever
 from core.retriever import (
     _distances_to_similarities,
     _clamp_overrides,
     query_chroma
 )
 
+# Read-only Chroma responses shared by the tests below
+_FILTER_CHROMA = {
+    "ids": [["doc1", "doc2", "doc3"]],
+    "documents": [["Relevant document", "Somewhat relevant", "Not relevant"]],
+    "metadatas": [[{"source": "test.txt"}] * 3],
+    "distances": [[0.1, 0.3, 0.6]]  # cosine distances
+}
+_OUT_OF_ORDER_CHROMA = {
+    "ids": [["doc1", "doc2", "doc3"]],
+    "documents": [["Weak", "Strong", "Medium"]],
+    "metadatas": [[{}] * 3],
+    "distances": [[0.5, 0.1, 0.3]]
+}
+_EMPTY_CHROMA = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
 
-def test_distances_to_similarities_cosine():
-    """Test cosine distance to similarity conversion."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "cosine"
-        distances = [0.0, 0.25, 0.5, 1.0]
-        similarities = _distances_to_similarities(distances)
-        
-        assert similarities == [1.0, 0.75, 0.5, 0.0]
+# One collection stub for the module, reset per test; spec_set keeps it to .query (no dunder mocks)
+_COLLECTION = Mock(spec_set=["query"])
 
 
-def test_distances_to_similarities_l2():
-    """Test L2 distance to similarity conversion."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "l2"
-        distances = [0.0, 1.0, 4.0]
-        similarities = _distances_to_similarities(distances)
-        
-        assert similarities[0] == 1.0  # 1 / (1 + 0)
-        assert similarities[1] == 0.5  # 1 / (1 + 1)
-        assert similarities[2] == 0.2  # 1 / (1 + 4)
+@pytest.fixture(autouse=True)
+def _clear_retrieval_cache():
+    """Keep cached retrievals from leaking between tests."""
+    retriever._retrieval_cache.clear()
 
 
-def test_distances_to_similarities_ip():
-    """Test inner product distance to similarity conversion."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "ip"
-        distances = [-0.8, -0.5, -0.1]
-        similarities = _distances_to_similarities(distances)
-        
-        assert similarities == [0.8, 0.5, 0.1]
+@pytest.fixture(autouse=True)
+def _fake_query_embeddings(monkeypatch):
+    """Stand in for Ollama: one (deterministic) vector per query text."""
+    mock_embed = Mock(side_effect=lambda texts: np.array([[float(ord(t[0]))] for t in texts]))
+    monkeypatch.setattr("core.retriever._embed_queries", mock_embed)
+    return mock_embed
+
+
+@pytest.mark.parametrize(
+    "metric,distances,expected",
+    [
+        ("cosine", [0.0, 0.25, 0.5, 1.0], [1.0, 0.75, 0.5, 0.0]),
+        ("l2", [0.0, 1.0, 4.0], [1.0, 0.5, 0.2]),  # 1 / (1 + d)
+        ("ip", [0.25, 0.5, 0.75], [0.75, 0.5, 0.25]),  # Chroma reports 1 - dot for "ip"
+    ],
+)
+def test_distances_to_similarities(metric, distances, expected):
+    """Test distance to similarity conversion per metric, for lists and ndarrays alike."""
+    assert _distances_to_similarities(distances, metric=metric).tolist() == expected
+    np.testing.assert_allclose(_distances_to_similarities(np.asarray(distances), metric=metric), expected)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "l2", "ip"])
+def test_distances_to_similarities_vectorized(metric):
+    """Test a large ndarray converts elementwise in one shot, matching the scalar formula."""
+    distances = np.linspace(0.0, 2.0, 10_000)
+
+    similarities = _distances_to_similarities(distances, metric=metric)
+
+    assert isinstance(similarities, np.ndarray)
+    assert similarities.shape == distances.shape
+    expected = 1.0 / (1.0 + distances) if metric == "l2" else 1.0 - distances
+    np.testing.assert_allclose(similarities, expected)
+
+
+def test_distances_to_similarities_defaults_to_configured_metric(monkeypatch):
+    """Test the configured metric is used when none is passed."""
+    monkeypatch.setattr("core.retriever._METRIC", "l2")
+
+    assert _distances_to_similarities([1.0]).tolist() == [0.5]
+
+
+@pytest.fixture
+def clamp_defaults(monkeypatch):
+    """Pin the retriever defaults _clamp_overrides falls back to."""
+    monkeypatch.setattr("core.retriever._METRIC", "cosine")
+    monkeypatch.setattr("core.retriever._DEFAULT_K", 5)
+    monkeypatch.setattr("core.retriever._DEFAULT_MIN_SIM", 0.6)
 
 
-def test_clamp_overrides_uses_defaults():
+def test_clamp_overrides_uses_defaults(clamp_defaults):
     """Test clamp_overrides uses config defaults when no overrides provided."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.6
-        
-        k, min_sim = _clamp_overrides(None, None)
-        
-        assert k == 5
-        assert min_sim == 0.6
+    k, min_sim = _clamp_overrides(None, None)
+    
+    assert k == 5
+    assert min_sim == 0.6
 
 
-def test_clamp_overrides_applies_limits():
+def test_clamp_overrides_applies_limits(clamp_defaults):
     """Test clamp_overrides enforces min/max limits."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.6
-        
-        # Test k clamping
-        k_low, _ = _clamp_overrides(0, None)
-        k_high, _ = _clamp_overrides(100, None)
-        
-        assert k_low == 1  # _MIN_K
-        assert k_high == 50  # _MAX_K
-        
-        # Test similarity clamping (only for cosine)
-        mock_settings.CHROMA_DISTANCE = "cosine"
-        _, sim_low = _clamp_overrides(None, -0.5)
-        _, sim_high = _clamp_overrides(None, 1.5)
-        
-        assert sim_low == 0.0  # _MIN_SIM
-        assert sim_high == 1.0  # _MAX_SIM (only clamped for cosine)
+    # Test k clamping
+    k_low, _ = _clamp_overrides(0, None)
+    k_high, _ = _clamp_overrides(100, None)
+    
+    assert k_low == 1  # _MIN_K
+    assert k_high == 50  # _MAX_K
+    
+    # Test similarity clamping (only for cosine)
+    _, sim_low = _clamp_overrides(None, -0.5)
+    _, sim_high = _clamp_overrides(None, 1.5)
+    
+    assert sim_low == 0.0  # _MIN_SIM
+    assert sim_high == 1.0  # _MAX_SIM (only clamped for cosine)
 
 
-def test_clamp_overrides_accepts_valid_values():
+def test_clamp_overrides_accepts_valid_values(clamp_defaults):
     """Test clamp_overrides accepts valid override values."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.6
-        
-        k, min_sim = _clamp_overrides(10, 0.75)
-        
-        assert k == 10
-        assert min_sim == 0.75
+    k, min_sim = _clamp_overrides(10, 0.75)
+    
+    assert k == 10
+    assert min_sim == 0.75
+
+
+class TestQueryChroma:
+    """query_chroma against a mocked collection with cosine, k=5 and min_similarity=0.65 defaults."""
 
+    @pytest.fixture(autouse=True)
+    def _settings(self, monkeypatch):
+        monkeypatch.setattr("core.retriever._METRIC", "cosine")
+        monkeypatch.setattr("core.retriever._DEFAULT_K", 5)
+        monkeypatch.setattr("core.retriever._DEFAULT_MIN_SIM", 0.65)
 
-@pytest.mark.asyncio
-async def test_query_chroma_success(sample_retrieval_results):
-    """Test successful document retrieval with filtering."""
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "cosine"
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.65
+    @pytest.fixture
+    def collection(self, monkeypatch):
+        """Mocked Chroma collection returned by get_chroma_collection."""
+        _COLLECTION.reset_mock(return_value=True, side_effect=True)
+        monkeypatch.setattr("core.retriever.get_chroma_collection", lambda: _COLLECTION)
+        return _COLLECTION
+
+    @pytest.mark.asyncio
+    async def test_query_chroma_success(self, collection, sample_retrieval_results):
+        """Test successful document retrieval with filtering."""
+        collection.query.return_value = sample_retrieval_results
         
-        # Mock ChromaDB collection
-        mock_collection = MagicMock()
-        mock_collection.query.return_value = sample_retrieval_results
+        results = query_chroma("What is Paris?", k=2, min_similarity=0.7)
         
-        with patch("core.retriever.get_chroma_collection", return_value=mock_collection):
-            results = query_chroma("What is Paris?", k=2, min_similarity=0.7)
-            
-            # Returns dict with documents/similarities keys
-            assert len(results["documents"]) == 2
-            assert results["documents"][0] == "Paris is the capital and largest city of France."
-            assert results["similarities"][0] == 0.85  # 1.0 - 0.15
-            assert results["similarities"][1] == 0.75  # 1.0 - 0.25
-
-
-@pytest.mark.asyncio
-async def test_query_chroma_filters_low_similarity():
-    """Test that documents below min_similarity threshold are filtered out."""
-    retrieval_results = {
-        "ids": [["doc1", "doc2", "doc3"]],
-        "documents": [[
-            "Relevant document",
-            "Somewhat relevant",
-            "Not relevant"
-        ]],
-        "metadatas": [[
-            {"source": "test.txt"},
-            {"source": "test.txt"},
-            {"source": "test.txt"}
-        ]],
-        "distances": [[0.1, 0.3, 0.6]]  # cosine distances
-    }
-    
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "cosine"
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.65
+        # Returns dict with documents/similarities keys
+        assert len(results["documents"]) == 2
+        assert results["documents"][0] == "Paris is the capital and largest city of France."
+        assert results["similarities"][0] == 0.85  # 1.0 - 0.15
+        assert results["similarities"][1] == 0.75  # 1.0 - 0.25
+
+    @pytest.mark.asyncio
+    async def test_query_chroma_filters_low_similarity(self, collection):
+        """Test that documents below min_similarity threshold are filtered out."""
+        collection.query.return_value = _FILTER_CHROMA
         
-        mock_collection = MagicMock()
-        mock_collection.query.return_value = retrieval_results
+        results = query_chroma("test query", k=3, min_similarity=0.65)
         
-        with patch("core.retriever.get_chroma_collection", return_value=mock_collection):
-            results = query_chroma("test query", k=3, min_similarity=0.65)
-            
-            # Only first two should pass (similarities 0.9 and 0.7, third is 0.4)
-            assert len(results["documents"]) == 2
-            assert results["similarities"][0] == 0.9
-            assert results["similarities"][1] == 0.7
-
-
-@pytest.mark.asyncio
-async def test_query_chroma_empty_results():
-    """Test handling of empty ChromaDB results."""
-    empty_results = {
-        "ids": [[]],
-        "documents": [[]],
-        "metadatas": [[]],
-        "distances": [[]]
-    }
-    
-    with patch("core.retriever.settings") as mock_settings:
-        mock_settings.CHROMA_DISTANCE = "cosine"
-        mock_settings.RETRIEVAL_K = 5
-        mock_settings.MIN_SIMILARITY = 0.65
+        # Only first two should pass (similarities 0.9 and 0.7, third is 0.4)
+        assert len(results["documents"]) == 2
+        assert results["similarities"][0] == 0.9
+        assert results["similarities"][1] == 0.7
+
+    @pytest.mark.asyncio
+    async def test_query_chroma_reorders_out_of_order_hits(self, collection):
+        """Test that hits Chroma returns out of distance order are still ranked best-first."""
+        collection.query.return_value = _OUT_OF_ORDER_CHROMA
+
+        results = query_chroma("test query", k=3, min_similarity=0.6)
+
+        assert results["documents"] == ["Strong", "Medium"]
+        assert results["raw_distances"] == [0.1, 0.3]
+
+    @pytest.mark.asyncio
+    async def test_query_chroma_empty_results(self, collection):
+        """Test handling of empty ChromaDB results."""
+        collection.query.return_value = _EMPTY_CHROMA
         
-        mock_collection = MagicMock()
-        mock_collection.query.return_value = empty_results
+        results = query_chroma("query with no results")
         
-        with patch("core.retriever.get_chroma_collection", return_value=mock_collection):
-            results = query_chroma("query with no results")
-            
-            assert results["documents"] == []
-            assert results["similarities"] == []
+        assert results["documents"] == []
+        assert results["similarities"] == []
+
+    def test_query_chroma_batches_concurrent_queries(self, collection):
+        """Test queries arriving while one is in flight share the next Chroma call."""
+        first_started = threading.Event()
+        release_first = threading.Event()
+        calls = []
+
+        def fake_query(query_embeddings, n_results, include):
+            texts = [chr(int(e[0])) for e in query_embeddings]  # invert the fake embedding
+            calls.append(texts)
+            if len(calls) == 1:
+                first_started.set()
+                release_first.wait(5)
+            return {
+                "documents": [[f"doc-{t}"] for t in texts],
+                "distances": [[0.1] for _ in texts],
+                "metadatas": [[{}] for _ in texts],
+            }
+
+        collection.query.side_effect = fake_query
+
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            first = ex.submit(query_chroma, "a")
+            assert first_started.wait(5)
+            rest = [ex.submit(query_chroma, t) for t in ("b", "c")]
+            while len(retriever._batcher._pending) < 2:
+                time.sleep(0.001)
+            release_first.set()
+            results = [f.result(timeout=5) for f in (first, *rest)]
+
+        assert calls[0] == ["a"]
+        assert sorted(calls[1]) == ["b", "c"]  # arrival order between b and c is up to the scheduler
+        assert [r["documents"] for r in results] == [["doc-a"], ["doc-b"], ["doc-c"]]
+
+    def test_query_chroma_interrupted_batch_wakes_waiters(self, collection):
+        """Test an interrupt in a batch propagates from its leader and wakes queued waiters with an error."""
+        class _Abort(BaseException):
+            pass
+
+        first_started = threading.Event()
+        release_first = threading.Event()
+        calls = []
+
+        def fake_query(query_embeddings, n_results, include):
+            calls.append(len(query_embeddings))
+            if len(calls) == 1:
+                first_started.set()
+                release_first.wait(5)
+                return {"documents": [["doc-a"]], "distances": [[0.1]], "metadatas": [[{}]]}
+            raise _Abort()
+
+        collection.query.side_effect = fake_query
+
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            first = ex.submit(query_chroma, "a")
+            assert first_started.wait(5)
+            rest = [ex.submit(query_chroma, t) for t in ("b", "c")]
+            while len(retriever._batcher._pending) < 2:
+                time.sleep(0.001)
+            release_first.set()
+            errors = sorted(type(f.exception(timeout=5)).__name__ for f in rest)
+
+        assert first.result(timeout=5)["documents"] == ["doc-a"]
+        assert errors == ["RuntimeError", "_Abort"]
+        assert not retriever._batcher._busy
+
+    def test_query_chroma_caches_repeated_queries(self, collection, sample_retrieval_results):
+        """Test an identical retrieval is served from cache without querying Chroma again."""
+        collection.query.return_value = sample_retrieval_results
+
+        first = query_chroma("What is Paris?", k=2, min_similarity=0.7)
+        first["documents"].clear()  # callers mutating a result must not poison the cache
+        second = query_chroma("What is Paris?", k=2, min_similarity=0.7)
+        query_chroma("What is Paris?", k=3, min_similarity=0.7)
+
+        assert len(second["documents"]) == 2
+        assert collection.query.call_count == 2  # different k is a different entry
+
+    def test_query_chroma_cache_keys_exact_threshold(self, collection, sample_retrieval_results):
+        """Test nearby min_similarity values do not share a cache entry filtered at the wrong threshold."""
+        collection.query.return_value = sample_retrieval_results
+
+        query_chroma("What is Paris?", k=2, min_similarity=0.7001)
+        query_chroma("What is Paris?", k=2, min_similarity=0.7004)
+
+        assert collection.query.call_count == 2
+
+    def test_query_chroma_passes_query_embeddings(self, collection, sample_retrieval_results, _fake_query_embeddings):
+        """Test retrieval embeds the query itself and sends vectors, not texts, to Chroma."""
+        collection.query.return_value = sample_retrieval_results
+
+        query_chroma("What is Paris?", k=2, min_similarity=0.7)
+
+        _fake_query_embeddings.assert_called_once_with(["What is Paris?"])
+        kwargs = collection.query.call_args.kwargs
+        assert "query_texts" not in kwargs
+        assert kwargs["query_embeddings"].shape == (1, 1)
+
+    def test_query_chroma_without_metadata(self, collection, sample_retrieval_results):
+        """Test need_metadata=False drops metadatas from include and fills empty dicts."""
+        collection.query.return_value = {**sample_retrieval_results, "metadatas": None}
+
+        results = query_chroma("What is Paris?", k=2, min_similarity=0.7, need_metadata=False)
 
+        assert collection.query.call_args.kwargs["include"] == ["documents", "distances"]
+        assert len(results["documents"]) == 2
+        assert results["metadatas"] == [{}, {}]
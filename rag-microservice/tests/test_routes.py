@@ -1,8 +1,14 @@
 """Integration tests for RAG API endpoints."""
 
+import orjson
 import pytest
 
 
+def _json(response):
+    """Decode a response body with orjson."""
+    return orjson.loads(response.content)
+
+
 # ==================== GET /health ====================
 
 @pytest.mark.asyncio
@@ -11,7 +17,7 @@ async def test_health_check_success(client):
     response = await client.get("/api/v1/health")
     
     assert response.status_code == 200
-    data = response.json()
+    data = _json(response)
     assert "status" in data
     # If degraded, check for error field instead of service
     if data["status"] == "degraded":
@@ -28,7 +34,7 @@ async def test_query_missing_auth(client, sample_query_request):
     response = await client.post("/api/v1/query", json=sample_query_request)
     
     assert response.status_code == 401
-    assert "detail" in response.json()
+    assert "detail" in _json(response)
 
 
 @pytest.mark.asyncio
@@ -105,158 +111,130 @@ async def test_query_invalid_min_similarity_type(client, valid_token):
 
 
 @pytest.mark.asyncio
-async def test_query_uses_default_values(client, valid_token):
+async def test_query_uses_default_values(client, valid_token, mock_rag):
     """Test query with minimal payload uses default values from config."""
-    from unittest.mock import patch
-    
     # Mock retrieval and generation with correct return format
-    mock_retrieval_results = {
-        "documents": ["Test document"],
-        "similarities": [0.9],
-        "metadatas": [{"source": "test.txt", "page": 1}],
-        "raw_distances": [0.1],
-        "metric": "cosine"
-    }
+    mock_rag(
+        documents=["Test document"],
+        similarities=[0.9],
+        metadatas=[{"source": "test.txt", "page": 1}],
+        raw_distances=[0.1],
+        metric="cosine",
+        answer="Test response",
+    )
+    
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "test query"},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
     
-    with patch("app.routes.query_chroma", return_value=mock_retrieval_results):
-        with patch("app.routes.generate_response", return_value="Test response"):
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test query"},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            assert data["response"] == "Test response"
-            assert len(data["context_docs"]) == 1
-            assert data["context_docs"][0] == "Test document"
+    assert response.status_code == 200
+    data = _json(response)
+    assert data["response"] == "Test response"
+    assert len(data["context_docs"]) == 1
+    assert data["context_docs"][0] == "Test document"
 
 
 @pytest.mark.asyncio
-async def test_query_with_custom_parameters(client, valid_token):
+async def test_query_with_custom_parameters(client, valid_token, mock_rag):
     """Test query with custom k and min_similarity parameters."""
-    from unittest.mock import patch
+    calls = mock_rag()
     
-    mock_retrieval_results = {
-        "documents": [],
-        "similarities": [],
-        "metadatas": [],
-        "raw_distances": [],
-        "metric": "cosine"
-    }
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "test", "k": 5, "min_similarity": 0.8},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
+    
+    # Verify custom parameters were passed to query_chroma
+    assert len(calls) == 1
+    args, _ = calls[0]
+    assert args[1] == 5  # k parameter
+    assert args[2] == 0.8  # min_similarity parameter
     
-    with patch("app.routes.query_chroma", return_value=mock_retrieval_results) as mock_query:
-        response = await client.post(
-            "/api/v1/query",
-            json={"text": "test", "k": 5, "min_similarity": 0.8},
-            headers={"Authorization": f"Bearer {valid_token}"}
-        )
-        
-        # Verify custom parameters were passed to query_chroma
-        assert mock_query.called
-        call_args = mock_query.call_args
-        assert call_args[0][1] == 5  # k parameter
-        assert call_args[0][2] == 0.8  # min_similarity parameter
-        
-        assert response.status_code == 200
+    assert response.status_code == 200
 
 
 @pytest.mark.asyncio
-async def test_query_no_retrieval_results(client, valid_token):
+async def test_query_no_retrieval_results(client, valid_token, mock_rag):
     """Test query when no documents match the similarity threshold."""
-    from unittest.mock import patch
+    mock_rag()
     
-    mock_empty = {
-        "documents": [],
-        "similarities": [],
-        "metadatas": [],
-        "raw_distances": [],
-        "metric": "cosine"
-    }
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "unknown query"},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
     
-    with patch("app.routes.query_chroma", return_value=mock_empty):
-        response = await client.post(
-            "/api/v1/query",
-            json={"text": "unknown query"},
-            headers={"Authorization": f"Bearer {valid_token}"}
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["context_docs"] == []
-        assert "No relevant documents" in data["response"]
+    assert response.status_code == 200
+    data = _json(response)
+    assert data["context_docs"] == []
+    assert "No relevant documents" in data["response"]
 
 
 @pytest.mark.asyncio
-async def test_query_with_multiple_sources(client, valid_token):
+async def test_query_with_multiple_sources(client, valid_token, mock_rag):
     """Test query returns multiple document sources."""
-    from unittest.mock import patch
-    
-    mock_retrieval_results = {
-        "documents": ["Document 1", "Document 2", "Document 3"],
-        "similarities": [0.95, 0.85, 0.75],
-        "metadatas": [
+    mock_rag(
+        documents=["Document 1", "Document 2", "Document 3"],
+        similarities=[0.95, 0.85, 0.75],
+        metadatas=[
             {"source": "doc1.txt", "page": 1},
             {"source": "doc2.txt", "page": 2},
             {"source": "doc3.txt", "page": 1}
         ],
-        "raw_distances": [0.05, 0.15, 0.25],
-        "metric": "cosine"
-    }
+        raw_distances=[0.05, 0.15, 0.25],
+        metric="cosine",
+        answer="Answer based on three sources",
+    )
+    
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "test"},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
     
-    with patch("app.routes.query_chroma", return_value=mock_retrieval_results):
-        with patch("app.routes.generate_response", return_value="Answer based on three sources"):
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test"},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 200
-            data = response.json()
-            assert len(data["context_docs"]) == 3
-            assert data["similarities"][0] == 0.95
-            assert data["similarities"][1] == 0.85
-            assert data["similarities"][2] == 0.75
+    assert response.status_code == 200
+    data = _json(response)
+    assert len(data["context_docs"]) == 3
+    assert data["similarities"][0] == 0.95
+    assert data["similarities"][1] == 0.85
+    assert data["similarities"][2] == 0.75
 
 
 @pytest.mark.asyncio
-async def test_query_handles_generation_error(client, valid_token):
+async def test_query_handles_generation_error(client, valid_token, mock_rag):
     """Test query handles LLM generation errors gracefully."""
-    from unittest.mock import patch
+    mock_rag(
+        documents=["Test doc"],
+        similarities=[0.9],
+        metadatas=[{}],
+        raw_distances=[0.1],
+        metric="cosine",
+        answer=Exception("Ollama connection error"),
+    )
     
-    mock_retrieval_results = {
-        "documents": ["Test doc"],
-        "similarities": [0.9],
-        "metadatas": [{}],
-        "raw_distances": [0.1],
-        "metric": "cosine"
-    }
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "test"},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
     
-    with patch("app.routes.query_chroma", return_value=mock_retrieval_results):
-        with patch("app.routes.generate_response", side_effect=Exception("Ollama connection error")):
-            response = await client.post(
-                "/api/v1/query",
-                json={"text": "test"},
-                headers={"Authorization": f"Bearer {valid_token}"}
-            )
-            
-            assert response.status_code == 500
-            assert "detail" in response.json()
+    assert response.status_code == 500
+    assert "detail" in _json(response)
 
 
 @pytest.mark.asyncio
-async def test_query_handles_retrieval_error(client, valid_token):
+async def test_query_handles_retrieval_error(client, valid_token, mock_rag):
     """Test query handles ChromaDB retrieval errors gracefully."""
-    from unittest.mock import patch
+    mock_rag(retrieval=Exception("ChromaDB connection error"))
+    
+    response = await client.post(
+        "/api/v1/query",
+        json={"text": "test"},
+        headers={"Authorization": f"Bearer {valid_token}"}
+    )
     
-    with patch("app.routes.query_chroma", side_effect=Exception("ChromaDB connection error")):
-        response = await client.post(
-            "/api/v1/query",
-            json={"text": "test"},
-            headers={"Authorization": f"Bearer {valid_token}"}
-        )
-        
-        assert response.status_code == 500
-        assert "detail" in response.json()
+    assert response.status_code == 500
+    assert "detail" in _json(response)
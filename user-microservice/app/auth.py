@@ -1,18 +1,29 @@
 """Authentication utilities for password hashing and JWT token management."""
 
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
+from functools import partial
+import jwt
 import bcrypt
 from .config import settings
 
 
 # ==================== Password Hashing ====================
 
-def hash_password(password: str) -> str:
-    """Hash a plain text password using bcrypt for secure storage."""
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in parallel
+# without the pickling/fork overhead of a process pool
+_BCRYPT_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="bcrypt")
+
+def hash_password(password: str, rounds: int | None = None) -> str:
+    """Hash a plain text password using bcrypt for secure storage. Defaults to BCRYPT_ROUNDS."""
     # bcrypt requires bytes and returns bytes
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     # Return as string for database storage
     return hashed.decode('utf-8')
@@ -25,29 +36,88 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
+def bulk_hash_passwords(passwords: list[str], rounds: int | None = None) -> list[str]:
+    """Hash many passwords across all cores (e.g. rehashing users to a new cost factor).
+    
+    Must not be called from a bcrypt pool thread, since it blocks on that pool.
+    """
+    return list(_BCRYPT_POOL.map(partial(hash_password, rounds=rounds), passwords))
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt pool so the event loop is not blocked."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_POOL, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt pool so the event loop is not blocked."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_POOL, verify_password, plain_password, hashed_password)
+
+
 # ==================== JWT Token Management ====================
 
+# Verified payloads keyed by a 16-byte digest of the raw token; entries expire at min(exp, now + TTL)
+_token_cache: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+
+# Settings are frozen at import, so the default token lifetime never changes
+_DEFAULT_EXPIRATION = timedelta(minutes=settings.JWT_EXPIRATION_MINUTES)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Create a JWT access token with optional expiration. Defaults to configured expiration time."""
     to_encode = data.copy()
     
-    # Set expiration time
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_EXPIRATION_MINUTES)
-    
-    to_encode.update({"exp": expire})
+    # Set expiration time as an integer timestamp so the encoder skips datetime conversion
+    expire = datetime.now(timezone.utc) + (expires_delta or _DEFAULT_EXPIRATION)
+    to_encode["exp"] = int(expire.timestamp())
     
     # Encode and return token
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 
+def _token_cache_key(token: str) -> bytes:
+    """Hash the token to a fixed-size key so cache memory does not grow with token length."""
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+
+def _cache_get(key: bytes) -> dict | None:
+    """Return a cached payload if it has not expired, refreshing its LRU position."""
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, payload = entry
+    if expires_at <= time.time():
+        _token_cache.pop(key, None)
+        return None
+    _token_cache.move_to_end(key)
+    return payload
+
+
+def _cache_put(key: bytes, payload: dict) -> None:
+    """Store a verified payload, evicting the least recently used entry when full."""
+    expires_at = time.time() + settings.JWT_CACHE_TTL
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    _token_cache[key] = (expires_at, payload)
+    if len(_token_cache) > settings.JWT_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+
 def decode_access_token(token: str) -> dict | None:
     """Decode and verify a JWT token. Returns payload dict if valid, None if invalid or expired."""
+    key = _token_cache_key(token)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return payload
-    except JWTError:
+    except jwt.PyJWTError:
+        # Failures are never cached
         return None
+    if settings.JWT_CACHE_SIZE > 0:
+        _cache_put(key, payload)
+    return payload
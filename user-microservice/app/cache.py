@@ -1,8 +1,13 @@
 """Redis cache management with connection pooling and graceful degradation."""
 
-import json
-from typing import Any, Optional
+import asyncio
+import fnmatch
+import time
+from collections import OrderedDict
+import orjson
+from typing import Any
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
 from app.config import settings
 from app.logger import logger
 
@@ -11,6 +16,21 @@ from app.logger import logger
 USER_BY_ID_PREFIX = "user:id"
 USER_BY_EMAIL_PREFIX = "user:email"
 
+# Pub/sub channels used to evict process-local copies across workers
+INVALIDATE_CHANNEL = "user:invalidate"
+INVALIDATE_PATTERN_CHANNEL = "user:invalidate:pattern"
+_INVALIDATE_PATTERN_CHANNEL_BYTES = INVALIDATE_PATTERN_CHANNEL.encode()
+
+# Failures that degrade to a cache miss: Redis/socket errors plus orjson's
+# decode (ValueError) and encode (TypeError) errors
+_CACHE_ERRORS = (RedisError, ConnectionError, ValueError, TypeError)
+
+# Resubscribe backoff for the invalidation listener (seconds)
+_LISTENER_RETRY_BASE = 0.5
+_LISTENER_RETRY_MAX = 30.0
+# Module-local alias so tests can skip the backoff without patching asyncio globally
+_sleep = asyncio.sleep
+
 
 def make_cache_key(prefix: str, identifier: Any) -> str:
     """Generate consistent cache key with namespace.
@@ -24,6 +44,21 @@ def make_cache_key(prefix: str, identifier: Any) -> str:
     """
     return f"{prefix}:{identifier}"
 
+
+# Full key prefixes for the hot user lookups, so each key is a single concatenation
+_USER_ID_KEY_PREFIX = f"{USER_BY_ID_PREFIX}:"
+_USER_EMAIL_KEY_PREFIX = f"{USER_BY_EMAIL_PREFIX}:"
+
+
+def user_id_key(user_id: int) -> str:
+    """Cache key for a user looked up by ID (e.g., "user:id:123")."""
+    return _USER_ID_KEY_PREFIX + str(user_id)
+
+
+def user_email_key(email: str) -> str:
+    """Cache key for a user looked up by email (e.g., "user:email:a@b.com")."""
+    return _USER_EMAIL_KEY_PREFIX + email
+
 # ==================== Cache Manager ====================
 
 
@@ -32,29 +67,128 @@ class CacheManager:
     
     If Redis is unavailable, operations fail silently and return None/False,
     allowing the application to continue without caching.
+    
+    While disconnected the instance's class is switched to _NullCacheManager,
+    whose operations are no-ops, so connected calls skip a per-op "is Redis
+    up?" check. The object identity never changes, so imported references
+    to cache_manager stay valid.
+    
+    Reads go through a small process-local LRU first (bounded by LOCAL_CACHE_SIZE
+    and LOCAL_CACHE_TTL). Deletes and overwrites are broadcast over Redis pub/sub so every
+    worker evicts its local copy; the TTL bounds staleness if a message is missed.
+    The local tier is only used while the invalidation subscription is live, and
+    is cleared and bypassed until the listener has resubscribed.
     """
     
     def __init__(self):
-        self._redis: Optional[aioredis.Redis] = None
+        self._redis: aioredis.Redis | None = None
+        self._local: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._listener: asyncio.Task | None = None
+        self._listening = False
+        self.__class__ = _NullCacheManager
+    
+    def _local_get(self, key: str) -> dict | None:
+        """Return a copy of a fresh local entry, refreshing its LRU position.
+        
+        Callers get their own dict so mutating a result cannot corrupt the
+        shared entry (user payloads are flat, so a shallow copy suffices).
+        """
+        if not self._listening:
+            return None
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return dict(value)
+    
+    def _local_put(self, key: str, value: dict) -> None:
+        """Store a local copy, evicting the least recently used entry when full."""
+        if not self._listening or settings.LOCAL_CACHE_SIZE <= 0:
+            return
+        self._local[key] = (time.monotonic() + settings.LOCAL_CACHE_TTL, dict(value))
+        self._local.move_to_end(key)
+        if len(self._local) > settings.LOCAL_CACHE_SIZE:
+            self._local.popitem(last=False)
+    
+    def _local_evict_pattern(self, pattern: str) -> None:
+        """Drop local copies whose keys match a Redis-style glob pattern."""
+        for key in [k for k in self._local if fnmatch.fnmatchcase(k, pattern)]:
+            del self._local[key]
+    
+    async def _subscribe(self):
+        """Subscribe to the invalidation channels and enable the local tier."""
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(INVALIDATE_CHANNEL, INVALIDATE_PATTERN_CHANNEL)
+        self._listening = True
+        return pubsub
+    
+    async def _listen_invalidations(self, pubsub) -> None:
+        """Evict local copies as other workers (or this one) publish invalidations.
+        
+        When the subscription drops, the local tier is cleared and bypassed and
+        the listener resubscribes with exponential backoff.
+        """
+        delay = _LISTENER_RETRY_BASE
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = await self._subscribe()
+                    logger.info("[cache] Invalidation listener resubscribed")
+                    delay = _LISTENER_RETRY_BASE
+                async for message in pubsub.listen():
+                    data = message["data"].decode("utf-8")
+                    if message["channel"] == _INVALIDATE_PATTERN_CHANNEL_BYTES:
+                        self._local_evict_pattern(data)
+                    else:
+                        self._local.pop(data, None)
+            except asyncio.CancelledError:
+                raise
+            except _CACHE_ERRORS as e:
+                logger.error("[cache] Invalidation listener failed, retrying in %.1fs: %s", delay, e)
+            finally:
+                # Without invalidations the local tier could serve stale entries
+                self._listening = False
+                self._local.clear()
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except _CACHE_ERRORS:
+                        pass  # The connection is already broken; resubscribe opens a fresh one
+                    pubsub = None
+            await _sleep(delay)
+            delay = min(delay * 2, _LISTENER_RETRY_MAX)
     
     async def connect(self):
         """Establish connection to Redis.
         
-        Creates a connection pool and verifies connectivity with ping.
-        Sets _redis to None if connection fails (graceful degradation).
+        Creates a bounded blocking connection pool and verifies connectivity
+        with ping. Callers wait up to REDIS_POOL_TIMEOUT for a free connection
+        instead of opening new sockets under load.
+        Stays a no-op _NullCacheManager if connection fails (graceful degradation).
         """
         if self._redis is None:
             try:
-                self._redis = await aioredis.from_url(
+                pool = aioredis.BlockingConnectionPool.from_url(
                     settings.REDIS_URL,
-                    encoding="utf-8",
-                    decode_responses=True,
+                    max_connections=settings.REDIS_POOL_SIZE,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    socket_keepalive=True,
                     socket_connect_timeout=5,
                 )
+                # Replies stay raw bytes: orjson parses them directly, skipping a UTF-8 decode per hit
+                # from_pool hands pool ownership to the client so close() disconnects it
+                self._redis = aioredis.Redis.from_pool(pool)
                 await self._redis.ping()
+                pubsub = await self._subscribe()
+                self._listener = asyncio.create_task(self._listen_invalidations(pubsub))
+                self.__class__ = CacheManager
                 logger.info("[cache] Connected to Redis")
-            except Exception as e:
-                logger.error(f"[cache] Failed to connect to Redis: {e}")
+            except _CACHE_ERRORS as e:
+                logger.error("[cache] Failed to connect to Redis: %s", e)
                 self._redis = None
     
     async def disconnect(self):
@@ -62,12 +196,21 @@ class CacheManager:
         
         Properly closes the connection pool during application shutdown.
         """
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._local.clear()
+        self.__class__ = _NullCacheManager
         if self._redis:
             await self._redis.close()
             self._redis = None
             logger.info("[cache] Disconnected from Redis")
     
-    async def get(self, key: str) -> Optional[dict]:
+    async def get(self, key: str) -> dict | None:
         """
         Get value from cache by key.
         
@@ -77,48 +220,178 @@ class CacheManager:
         Returns:
             Cached value as dict, or None if not found
         """
-        if not self._redis:
-            return None
+        local = self._local_get(key)
+        if local is not None:
+            logger.debug("[cache] LOCAL HIT: %s", key)
+            return local
         
         try:
             value = await self._redis.get(key)
             if value:
-                logger.debug(f"[cache] HIT: {key}")
-                return json.loads(value)
-            logger.debug(f"[cache] MISS: {key}")
+                logger.debug("[cache] HIT: %s", key)
+                data = orjson.loads(value)
+                self._local_put(key, data)
+                return data
+            logger.debug("[cache] MISS: %s", key)
             return None
-        except Exception as e:
-            logger.error(f"[cache] Error getting key {key}: {e}")
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error getting key %s: %s", key, e)
             return None
     
+    async def mget(self, keys: list[str]) -> dict[str, dict | None]:
+        """
+        Get multiple values from cache in a single MGET round-trip.
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Mapping of each key to its cached dict, or None if not found
+        """
+        if not keys:
+            return {}
+        
+        result = {k: self._local_get(k) for k in keys}
+        missing = [k for k, v in result.items() if v is None]
+        if not missing:
+            return result
+        
+        try:
+            values = await self._redis.mget(missing)
+            logger.debug("[cache] MGET: %d keys (%d hits)", len(missing), sum(v is not None for v in values))
+            for k, v in zip(missing, values):
+                if v:
+                    result[k] = orjson.loads(v)
+                    self._local_put(k, result[k])
+            return result
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error getting %d keys: %s", len(keys), e)
+            return dict.fromkeys(keys)
+    
     async def set(
         self,
         key: str,
         value: dict,
-        ttl: Optional[int] = None
+        ttl: int | None = None,
+        *,
+        nx: bool = False,
+        xx: bool = False,
     ) -> bool:
         """
-        Set value in cache with optional TTL.
+        Set value in cache with optional TTL using a single SET ... EX.
+        
+        Writes that may overwrite an existing value (anything but NX) also
+        publish the key on the same pipeline so other workers drop stale
+        local copies.
         
         Args:
             key: Cache key
             value: Value to cache (must be JSON-serializable)
             ttl: Time-to-live in seconds (None = use default)
+            nx: Only set if the key does not already exist (cache-aside population)
+            xx: Only set if the key already exists
             
         Returns:
-            True if successful, False otherwise
+            True if the value was written, False otherwise (including NX/XX rejections)
+        """
+        try:
+            ttl = ttl or settings.CACHE_TTL
+            serialized = orjson.dumps(value, default=str)
+            if nx:
+                written = await self._redis.set(key, serialized, ex=ttl, nx=True, xx=xx)
+            else:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(key, serialized, ex=ttl, xx=xx)
+                    pipe.publish(INVALIDATE_CHANNEL, key)
+                    written, _ = await pipe.execute()
+            if written:
+                self._local.pop(key, None)
+            logger.debug("[cache] SET: %s (TTL=%ss, written=%s)", key, ttl, bool(written))
+            return bool(written)
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error setting key %s: %s", key, e)
+            return False
+    
+    async def mset(
+        self,
+        items: dict[str, dict],
+        ttl: int | None = None,
+        *,
+        nx: bool = False,
+    ) -> bool:
         """
-        if not self._redis:
+        Set multiple values with a shared TTL using one pipelined round-trip.
+        
+        Unless NX is set, each key is also published on the same pipeline so
+        other workers drop stale local copies.
+        
+        Args:
+            items: Mapping of cache key to value (values must be JSON-serializable)
+            ttl: Time-to-live in seconds (None = use default)
+            nx: Only set keys that do not already exist
+            
+        Returns:
+            True if every value was written, False otherwise
+        """
+        if not items:
             return False
         
         try:
             ttl = ttl or settings.CACHE_TTL
-            serialized = json.dumps(value, default=str)
-            await self._redis.setex(key, ttl, serialized)
-            logger.debug(f"[cache] SET: {key} (TTL={ttl}s)")
-            return True
-        except Exception as e:
-            logger.error(f"[cache] Error setting key {key}: {e}")
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, orjson.dumps(value, default=str), ex=ttl, nx=nx)
+                if not nx:
+                    for key in items:
+                        pipe.publish(INVALIDATE_CHANNEL, key)
+                # Trailing replies are PUBLISH subscriber counts
+                results = (await pipe.execute())[:len(items)]
+            for key in items:
+                self._local.pop(key, None)
+            logger.debug("[cache] MSET: %d keys (TTL=%ss)", len(items), ttl)
+            return all(results)
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error setting %d keys: %s", len(items), e)
+            return False
+    
+    async def set_user(
+        self,
+        user: dict,
+        ttl: int | None = None,
+        *,
+        nx: bool = False,
+    ) -> bool:
+        """
+        Write a user under both its ID and email keys in one pipelined round-trip.
+        
+        The payload is serialized once and shared by both keys. Unless NX is
+        set, both keys are also published so other workers drop stale local copies.
+        
+        Args:
+            user: User data containing at least "id" and "email"
+            ttl: Time-to-live in seconds (None = use default)
+            nx: Only set keys that do not already exist
+            
+        Returns:
+            True if both keys were written, False otherwise
+        """
+        try:
+            ttl = ttl or settings.CACHE_TTL
+            serialized = orjson.dumps(user, default=str)
+            id_key, email_key = user_id_key(user["id"]), user_email_key(user["email"])
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(id_key, serialized, ex=ttl, nx=nx)
+                pipe.set(email_key, serialized, ex=ttl, nx=nx)
+                if not nx:
+                    pipe.publish(INVALIDATE_CHANNEL, id_key)
+                    pipe.publish(INVALIDATE_CHANNEL, email_key)
+                results = (await pipe.execute())[:2]
+            self._local.pop(id_key, None)
+            self._local.pop(email_key, None)
+            logger.debug("[cache] SET USER: id=%s (TTL=%ss)", user["id"], ttl)
+            return all(results)
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error caching user %s: %s", user.get("id"), e)
             return False
     
     async def delete(self, key: str) -> bool:
@@ -131,15 +404,16 @@ class CacheManager:
         Returns:
             True if successful, False otherwise
         """
-        if not self._redis:
-            return False
-        
+        self._local.pop(key, None)
         try:
-            await self._redis.delete(key)
-            logger.debug(f"[cache] DELETE: {key}")
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                pipe.publish(INVALIDATE_CHANNEL, key)
+                await pipe.execute()
+            logger.debug("[cache] DELETE: %s", key)
             return True
-        except Exception as e:
-            logger.error(f"[cache] Error deleting key {key}: {e}")
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error deleting key %s: %s", key, e)
             return False
     
     async def delete_pattern(self, pattern: str) -> int:
@@ -147,7 +421,10 @@ class CacheManager:
         Delete all keys matching pattern using cursor-based iteration.
         
         Uses SCAN instead of KEYS to avoid blocking Redis in production.
-        Deletes keys in batches for efficiency.
+        Matching keys are grouped into one UNLINK per CACHE_DELETE_BATCH keys
+        and queued on a non-transactional pipeline that is flushed once, so
+        Redis frees memory in a background thread and no scan step waits on
+        a delete round-trip.
         
         Args:
             pattern: Redis pattern (e.g., "user:*")
@@ -155,32 +432,30 @@ class CacheManager:
         Returns:
             Number of keys deleted
         """
-        if not self._redis:
-            return 0
-        
         try:
-            keys_to_delete = []
-            total_deleted = 0
+            batch = settings.CACHE_DELETE_BATCH
+            chunk: list[bytes] = []
             
-            async for key in self._redis.scan_iter(match=pattern, count=100):
-                keys_to_delete.append(key)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                async for key in self._redis.scan_iter(match=pattern, count=settings.CACHE_SCAN_COUNT):
+                    chunk.append(key)
+                    if len(chunk) >= batch:
+                        pipe.unlink(*chunk)
+                        chunk = []
+                if chunk:
+                    pipe.unlink(*chunk)
                 
-                # Batch delete every 100 keys
-                if len(keys_to_delete) >= 100:
-                    await self._redis.delete(*keys_to_delete)
-                    total_deleted += len(keys_to_delete)
-                    keys_to_delete.clear()
+                pipe.publish(INVALIDATE_PATTERN_CHANNEL, pattern)
+                # Last reply is the PUBLISH subscriber count
+                total_deleted = sum((await pipe.execute())[:-1])
             
-            # Delete remaining keys
-            if keys_to_delete:
-                await self._redis.delete(*keys_to_delete)
-                total_deleted += len(keys_to_delete)
+            self._local_evict_pattern(pattern)
             
             if total_deleted > 0:
-                logger.debug(f"[cache] DELETE PATTERN: {pattern} ({total_deleted} keys)")
+                logger.debug("[cache] DELETE PATTERN: %s (%d keys)", pattern, total_deleted)
             return total_deleted
-        except Exception as e:
-            logger.error(f"[cache] Error deleting pattern {pattern}: {e}")
+        except _CACHE_ERRORS as e:
+            logger.error("[cache] Error deleting pattern %s: %s", pattern, e)
             return 0
     
     async def health_check(self) -> bool:
@@ -190,15 +465,47 @@ class CacheManager:
         Returns:
             True if Redis responds to ping, False otherwise
         """
-        if not self._redis:
-            return False
-        
         try:
             await self._redis.ping()
             return True
-        except Exception:
+        except _CACHE_ERRORS:
             return False
 
+class _NullCacheManager(CacheManager):
+    """Disconnected state of CacheManager: every operation is a cache miss or a no-op."""
+    
+    async def get(self, key: str) -> dict | None:
+        return None
+    
+    async def mget(self, keys: list[str]) -> dict[str, dict | None]:
+        return dict.fromkeys(keys)
+    
+    async def set(
+        self,
+        key: str,
+        value: dict,
+        ttl: int | None = None,
+        *,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> bool:
+        return False
+    
+    async def mset(self, items: dict[str, dict], ttl: int | None = None, *, nx: bool = False) -> bool:
+        return False
+    
+    async def set_user(self, user: dict, ttl: int | None = None, *, nx: bool = False) -> bool:
+        return False
+    
+    async def delete(self, key: str) -> bool:
+        return False
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        return 0
+    
+    async def health_check(self) -> bool:
+        return False
+
 # ==================== Global Instance ====================
 
 cache_manager = CacheManager()
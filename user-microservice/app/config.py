@@ -1,34 +1,39 @@
 """Configuration management and validation using Pydantic."""
 
+import functools
 import os
+from dataclasses import make_dataclass
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 
 
+@functools.cache
+def get_env_file() -> str | None:
+    """Determine which .env file to load based on environment variables.
+    
+    Resolved once per process; the environment does not change after boot.
+    
+    Returns:
+        None if SKIP_ENV_FILE is set (Docker/direct env vars)
+        .env.{APP_ENV} file path otherwise (defaults to .env.dev)
+    """
+    if os.getenv("SKIP_ENV_FILE"):
+        return None
+    env = os.getenv("APP_ENV", "dev")
+    env_file = f".env.{env}"
+    if not os.path.exists(env_file):
+        raise FileNotFoundError(
+            f"Environment file '{env_file}' not found. "
+            f"Create it or set APP_ENV to 'dev' or 'prod'."
+        )
+    return env_file
+
+
 class Settings(BaseSettings):
     """Application configuration settings loaded from environment variables or .env files."""
     
-    @staticmethod
-    def get_env_file() -> str | None:
-        """Determine which .env file to load based on environment variables.
-        
-        Returns:
-            None if SKIP_ENV_FILE is set (Docker/direct env vars)
-            .env.{APP_ENV} file path otherwise (defaults to .env.dev)
-        """
-        if os.getenv("SKIP_ENV_FILE"):
-            return None
-        env = os.getenv("APP_ENV", "dev")
-        env_file = f".env.{env}"
-        if not os.path.exists(env_file):
-            raise FileNotFoundError(
-                f"Environment file '{env_file}' not found. "
-                f"Create it or set APP_ENV to 'dev' or 'prod'."
-            )
-        return env_file
-    
     model_config = SettingsConfigDict(
-        env_file=get_env_file.__func__(),
+        env_file=get_env_file(),
         env_file_encoding="utf-8",
         extra="ignore"
     )
@@ -61,6 +66,7 @@ class Settings(BaseSettings):
     # ==================== Batch Operations ====================
     MAX_BATCH_SIZE: int = 1000
     CHUNK_SIZE: int = 100
+    STREAM_BATCH_SIZE: int = 1000  # Rows per server-side cursor fetch in /users/export
     
     # ==================== Field Validation ====================
     USER_NAME_MAX_LENGTH: int = 100
@@ -70,6 +76,9 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str  # Required, defined in .env files
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 30
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost factor (log2 of key-schedule iterations, 4-31)
+    JWT_CACHE_SIZE: int = 10000  # Max verified token payloads kept in memory (0 disables)
+    JWT_CACHE_TTL: float = 60.0  # Seconds a verified payload is reused (capped by token exp)
     
     # ==================== Rate Limiting ====================
     RATE_LIMIT_BATCH: str = "10/minute"
@@ -86,8 +95,14 @@ class Settings(BaseSettings):
     
     # ==================== Redis Caching ====================
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_POOL_SIZE: int = 50  # Max connections in the Redis pool
+    REDIS_POOL_TIMEOUT: int = 20  # Seconds to wait for a free Redis connection
     CACHE_TTL: int = 300  # Default TTL in seconds (5 minutes)
     CACHE_ENABLED: bool = True  # Global cache toggle
+    LOCAL_CACHE_SIZE: int = 10000  # Per-process LRU entries in front of Redis (0 disables)
+    LOCAL_CACHE_TTL: float = 60.0  # Seconds a process-local copy is served
+    CACHE_SCAN_COUNT: int = 1000  # SCAN COUNT hint for pattern deletes
+    CACHE_DELETE_BATCH: int = 500  # Keys per UNLINK command in pattern deletes
     
     @field_validator('DB_URL')
     @classmethod
@@ -113,4 +128,14 @@ class Settings(BaseSettings):
         """Parse CORS_ORIGINS into a list of allowed origins."""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
 
-settings = Settings()
+
+# Pydantic validates once at startup; request paths then read plain slotted attributes
+RuntimeSettings = make_dataclass(
+    "RuntimeSettings",
+    [(name, field.annotation) for name, field in Settings.model_fields.items()],
+    namespace={"__module__": __name__, "get_cors_origins": Settings.get_cors_origins},
+    slots=True,
+    frozen=True,
+)
+
+settings = RuntimeSettings(**Settings().model_dump())
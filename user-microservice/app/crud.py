@@ -1,7 +1,14 @@
 """Database CRUD operations for user management."""
 
-from sqlalchemy import select, func, or_
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import asyncpg
+from sqlalchemy import bindparam, delete, insert, select, func, or_
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import db
 from .models import User
@@ -9,10 +16,19 @@ from .logger import logger
 from .config import settings
 
 
+# ==================== Prebuilt Statements ====================
+
+# Hot lookups are built once so calls skip statement construction and cache-key generation
+_SELECT_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_SELECT_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+# Authentication only needs the id and active flag, so skip hydrating a full entity
+_SELECT_USER_AUTH_ROW = select(User.id, User.is_active).where(User.id == bindparam("user_id"))
+
+
 # ==================== Helper Functions ====================
 
-def _create_user_snapshot(user: User) -> User:
-    """Create a detached snapshot of a user before deletion."""
+def _create_user_snapshot(user: User | Row) -> User:
+    """Create a detached snapshot of a user (or a RETURNING row) before deletion."""
     snapshot = User()
     snapshot.id = user.id
     snapshot.name = user.name
@@ -23,6 +39,35 @@ def _create_user_snapshot(user: User) -> User:
     return snapshot
 
 
+@asynccontextmanager
+async def _use_session(session: AsyncSession | None) -> AsyncIterator[AsyncSession]:
+    """Yield the caller's request-scoped session, or open (and close) a fresh one."""
+    if session is not None:
+        yield session
+    else:
+        async with db.async_session() as own:
+            yield own
+
+
+async def _fetch_page_with_total(
+    session: AsyncSession, stmt, conditions: list, skip: int
+) -> tuple[list[User], int]:
+    """Run a page query carrying count(*) OVER () and split it into (users, total).
+    
+    A page past the end returns no rows and therefore no total, so only then
+    fall back to a separate count query.
+    """
+    rows = (await session.execute(stmt)).all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total
+    if skip == 0:
+        return [], 0
+    count_stmt = select(func.count()).select_from(User)
+    if conditions:
+        count_stmt = count_stmt.where(*conditions)
+    return [], (await session.execute(count_stmt)).scalar() or 0
+
+
 # ==================== Single User Operations ====================
 
 
@@ -31,28 +76,42 @@ async def insert_user(name: str, email: str, hashed_password: str) -> User:
     async with db.async_session() as session:
         try:
             async with session.begin():
-                user = User(name=name, email=email, hashed_password=hashed_password)
-                session.add(user)
-            await session.refresh(user) # To update ORM object
+                # RETURNING hydrates id/created_at in the INSERT round-trip (no refresh afterwards)
+                result = await session.execute(
+                    insert(User)
+                    .values(name=name, email=email, hashed_password=hashed_password)
+                    .returning(User)
+                )
+                user = result.scalar_one()
             return user
         except IntegrityError as e:
             await session.rollback()
-            logger.debug(f"Duplicate email rejected: {email}")
+            logger.debug("Duplicate email rejected: %s", email)
             raise ValueError("duplicate email") from e
 
 
-async def select_user_by_email(email: str) -> User | None:
-    """Retrieve a user by email address."""
-    async with db.async_session() as session:
-        result = await session.execute(select(User).where(User.email == email))
+async def select_user_by_email(email: str, session: AsyncSession | None = None) -> User | None:
+    """Retrieve a user by email address, reusing the request session when given."""
+    async with _use_session(session) as s:
+        result = await s.execute(_SELECT_USER_BY_EMAIL, {"email": email})
         return result.scalars().first()
 
 
-async def select_user(user_id: int) -> User | None:
-    """Retrieve a user by ID."""
-    async with db.async_session() as session:
-        result = await session.get(User, user_id)
-        return result
+async def select_user(user_id: int, session: AsyncSession | None = None) -> User | None:
+    """Retrieve a user by ID, reusing the request session when given."""
+    async with _use_session(session) as s:
+        result = await s.execute(_SELECT_USER_BY_ID, {"user_id": user_id})
+        return result.scalars().first()
+
+
+async def select_user_auth_row(
+    user_id: int, session: AsyncSession | None = None
+) -> tuple[int, bool] | None:
+    """Retrieve only (id, is_active) for a user, reusing the request session when given."""
+    async with _use_session(session) as s:
+        result = await s.execute(_SELECT_USER_AUTH_ROW, {"user_id": user_id})
+        row = result.first()
+        return (row.id, row.is_active) if row is not None else None
 
 
 async def delete_user(user_id: int) -> User | None:
@@ -89,14 +148,8 @@ async def list_users(
                 conditions.append(User.email == email)
             if email_domain:
                 conditions.append(User.email.ilike(f"%@{email_domain}"))
-            # Total count w/ same filters
-            count_stmt = select(func.count()).select_from(User)
-            if conditions:
-                count_stmt = count_stmt.where(*conditions)
-            count_result = await session.execute(count_stmt)
-            total = count_result.scalar() or 0
-            # Fetch paginated users with filters and sorting
-            stmt = select(User)
+            # Fetch paginated users with filters and sorting; the window count carries the total
+            stmt = select(User, func.count().over().label("total"))
             if conditions:
                 stmt = stmt.where(*conditions)
             # Apply sorting
@@ -106,9 +159,8 @@ async def list_users(
             else:
                 stmt = stmt.order_by(sort_column.asc())
             stmt = stmt.offset(skip).limit(limit) # Pagination
-            result = await session.execute(stmt)
-            users = result.scalars().all()
-            logger.debug(f"Query executed: returned {len(users)} users out of {total} total")
+            users, total = await _fetch_page_with_total(session, stmt, conditions, skip)
+            logger.debug("Query executed: returned %d users out of %d total", len(users), total)
             return users, total
         except Exception:
             await session.rollback()
@@ -116,10 +168,38 @@ async def list_users(
             raise
 
 
+async def iter_users(
+    email: str | None = None,
+    email_domain: str | None = None,
+    sort: str = "id",
+    order: str = "asc",
+) -> AsyncIterator[User]:
+    """Stream every matching user through a server-side cursor, fetching STREAM_BATCH_SIZE rows at a time."""
+    conditions: list = []
+    if email:
+        conditions.append(User.email == email)
+    if email_domain:
+        conditions.append(User.email.ilike(f"%@{email_domain}"))
+    stmt = select(User).execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+    if conditions:
+        stmt = stmt.where(*conditions)
+    sort_column = getattr(User, sort, User.id)
+    stmt = stmt.order_by(sort_column.desc() if order == "desc" else sort_column.asc())
+    async with db.async_session() as session:
+        try:
+            result = await session.stream(stmt)
+            async for user in result.scalars():
+                yield user
+        except Exception:
+            await session.rollback()
+            logger.error("Failed to stream users", exc_info=True)
+            raise
+
+
 # ==================== Batch Operations ====================
 
 async def insert_users(items: list[dict]) -> list[User]:
-    """Insert multiple users in a single transaction, processing in chunks for memory efficiency.
+    """Insert multiple users with a single PostgreSQL COPY.
     All-or-nothing: either all users are inserted or none are (atomic operation).
     Raises ValueError on duplicate email.
     
@@ -133,46 +213,34 @@ async def insert_users(items: list[dict]) -> list[User]:
         if 'hashed_password' not in item:
             raise ValueError("Each user item must include 'hashed_password' field")
     
-    total_chunks = (len(items) + settings.CHUNK_SIZE - 1) // settings.CHUNK_SIZE
-    logger.debug(f"Processing {len(items)} users in {total_chunks} chunks of {settings.CHUNK_SIZE} (atomic transaction)")
+    logger.debug("Bulk loading %d users via COPY (atomic statement)", len(items))
+    
+    records = [(item["name"], item["email"], item["hashed_password"], True) for item in items]
     
-    # Single session for entire batch - atomic transaction
     async with db.async_session() as session:
         try:
-            async with session.begin():  # Single transaction for entire batch
-                all_users = []
-                
-                # Process in chunks for memory efficiency
-                for i in range(0, len(items), settings.CHUNK_SIZE):
-                    chunk = items[i:i + settings.CHUNK_SIZE]
-                    chunk_num = (i // settings.CHUNK_SIZE) + 1
-                    logger.debug(f"Processing chunk {chunk_num}/{total_chunks} ({len(chunk)} users)")
-                    
-                    objs = [
-                        User(
-                            name=item["name"],
-                            email=item["email"],
-                            hashed_password=item["hashed_password"],
-                        )
-                        for item in chunk
-                    ]
-                    session.add_all(objs)
-                    all_users.extend(objs)
-                    
-                    logger.debug(f"Chunk {chunk_num}/{total_chunks} staged")
+            async with session.begin():
+                # COPY streams every row in one protocol exchange; a single COPY is atomic on its own
+                conn = await session.connection()
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    User.__tablename__,
+                    records=records,
+                    columns=["name", "email", "hashed_password", "is_active"],
+                )
                 
-                # Transaction commits here automatically (or rolls back on error)
-            
-            # Refresh all objects to populate IDs after commit
-            for obj in all_users:
-                await session.refresh(obj)
+                # Hydrate ids and server defaults with one query instead of a refresh per row
+                emails = [item["email"] for item in items]
+                result = await session.execute(select(User).where(User.email.in_(emails)))
+                by_email = {u.email: u for u in result.scalars()}
+                all_users = [by_email[email] for email in emails]
             
-            logger.debug(f"Batch insert completed: {len(all_users)} users created")
+            logger.debug("Batch insert completed: %d users created", len(all_users))
             return all_users
             
-        except IntegrityError as e:
+        except (IntegrityError, asyncpg.UniqueViolationError) as e:
             # Transaction automatically rolled back
-            logger.error(f"Batch insert failed: duplicate email (transaction rolled back)")
+            logger.error("Batch insert failed: duplicate email (transaction rolled back)")
             raise ValueError("duplicate email") from e
         except Exception as e:
             logger.error(f"Batch insert failed: {str(e)} (transaction rolled back)", exc_info=True)
@@ -188,7 +256,11 @@ async def delete_users(ids: list[int]) -> list[User]:
         return []
     
     total_chunks = (len(ids) + settings.CHUNK_SIZE - 1) // settings.CHUNK_SIZE
-    logger.debug(f"Processing {len(ids)} deletions in {total_chunks} chunks of {settings.CHUNK_SIZE} (atomic transaction)")
+    debug = logger.isEnabledFor(logging.DEBUG)  # Skip per-chunk log work outside DEBUG
+    logger.debug(
+        "Processing %d deletions in %d chunks of %d (atomic transaction)",
+        len(ids), total_chunks, settings.CHUNK_SIZE,
+    )
     
     # Single session for entire batch - atomic transaction
     async with db.async_session() as session:
@@ -199,25 +271,24 @@ async def delete_users(ids: list[int]) -> list[User]:
                 # Process in chunks for memory efficiency
                 for i in range(0, len(ids), settings.CHUNK_SIZE):
                     chunk = ids[i:i + settings.CHUNK_SIZE]
-                    chunk_num = (i // settings.CHUNK_SIZE) + 1
-                    logger.debug(f"Processing chunk {chunk_num}/{total_chunks} ({len(chunk)} users)")
+                    if debug:
+                        chunk_num = (i // settings.CHUNK_SIZE) + 1
+                        logger.debug("Processing chunk %d/%d (%d users)", chunk_num, total_chunks, len(chunk))
                     
-                    result = await session.execute(select(User).where(User.id.in_(chunk)))
-                    users = result.scalars().all()
+                    # One DELETE ... RETURNING per chunk; chunking only bounds the IN-list size
+                    result = await session.execute(
+                        delete(User).where(User.id.in_(chunk)).returning(*User.__table__.c)
+                    )
+                    rows = result.all()
                     
-                    if users:
-                        # Take snapshots before deletion with all fields
-                        deleted = []
-                        for u in users:
-                            snapshot = _create_user_snapshot(u)
-                            deleted.append(snapshot)
-                            await session.delete(u)
-                        all_deleted.extend(deleted)
-                        logger.debug(f"Chunk {chunk_num}/{total_chunks} staged: {len(users)} users")
+                    if rows:
+                        all_deleted.extend(_create_user_snapshot(row) for row in rows)
+                        if debug:
+                            logger.debug("Chunk %d/%d staged: %d users", chunk_num, total_chunks, len(rows))
                 
                 # Transaction commits here automatically (or rolls back on error)
             
-            logger.debug(f"Batch delete completed: {len(all_deleted)} users deleted")
+            logger.debug("Batch delete completed: %d users deleted", len(all_deleted))
             return all_deleted
             
         except Exception as e:
@@ -247,22 +318,16 @@ async def search_users(
                 User.email.ilike(search_pattern, escape="\\")
             )
             
-            # Count total matching users
-            count_stmt = select(func.count()).select_from(User).where(search_condition)
-            count_result = await session.execute(count_stmt)
-            total = count_result.scalar() or 0
-            
-            # Fetch paginated results with sorting
-            stmt = select(User).where(search_condition)
+            # Fetch paginated results with sorting; the window count carries the total
+            stmt = select(User, func.count().over().label("total")).where(search_condition)
             sort_column = getattr(User, sort, User.id)
             if order == "desc":
                 stmt = stmt.order_by(sort_column.desc())
             else:
                 stmt = stmt.order_by(sort_column.asc())
             stmt = stmt.offset(skip).limit(limit)
-            result = await session.execute(stmt)
-            users = result.scalars().all()
-            logger.debug(f"Search query executed: found {len(users)} users (total matches: {total})")
+            users, total = await _fetch_page_with_total(session, stmt, [search_condition], skip)
+            logger.debug("Search query executed: found %d users (total matches: %d)", len(users), total)
             return users, total
         except Exception as e:
             logger.error(f"Search query failed for term '{query}': {str(e)}", exc_info=True)
@@ -1,10 +1,11 @@
 """Database connection pooling, session management, and resilience utilities."""
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.exc import OperationalError, DBAPIError
 from sqlalchemy import text
 import asyncio
+import re
 from .config import settings
 from .logger import logger
 
@@ -31,14 +32,32 @@ logger.info(
 )
 
 # Session factory for creating database sessions
-async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# autoflush is off: sessions are short-lived and never query pending objects they added
+async_session = async_sessionmaker(engine, expire_on_commit=False, autoflush=False, class_=AsyncSession)
+
+
+class Base(DeclarativeBase):
+    """Base class for ORM models."""
 
-# Base class for ORM models
-Base = declarative_base()
 
 # ==================== Database Resilience ====================
 
 
+# SQLSTATEs for transient failures: class 08 (connection exception) and admin/crash shutdowns
+_RETRYABLE_SQLSTATE_PREFIXES = ("08", "57P01", "57P02", "57P03")
+# Fallback for errors without a SQLSTATE (driver-level timeouts, dropped sockets)
+_RETRYABLE_MESSAGE_RE = re.compile(r"connection|timeout|database is locked", re.IGNORECASE)
+
+
+def _is_retryable(e: DBAPIError) -> bool:
+    """Check if error is retryable (connection issues, not constraint violations)."""
+    orig = getattr(e, "orig", None)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate:
+        return sqlstate.startswith(_RETRYABLE_SQLSTATE_PREFIXES)
+    return _RETRYABLE_MESSAGE_RE.search(str(e)) is not None
+
+
 async def retry_on_db_error(func, max_retries: int = 3, base_delay: float = 0.5):
     """Retry database operations with exponential backoff.
     
@@ -61,15 +80,7 @@ async def retry_on_db_error(func, max_retries: int = 3, base_delay: float = 0.5)
         except (OperationalError, DBAPIError) as e:
             last_exception = e
             
-            # Check if error is retryable (connection issues, not constraint violations)
-            error_msg = str(e).lower()
-            is_retryable = any([
-                "connection" in error_msg,
-                "timeout" in error_msg,
-                "database is locked" in error_msg,
-                "server closed the connection" in error_msg,
-                "connection reset" in error_msg,
-            ])
+            is_retryable = _is_retryable(e)
             
             if not is_retryable or attempt == max_retries - 1:
                 logger.error(
@@ -1,25 +1,69 @@
 """FastAPI dependencies for authentication and authorization."""
 
-from fastapi import Depends, HTTPException, status
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import db
 from .auth import decode_access_token
-from .crud import select_user
+from .crud import select_user_auth_row
 from .models import User
 from .schemas import ErrorCode
 
 
+# ==================== Database Dependencies ====================
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """Yield one AsyncSession per request; a pooled connection is only checked out on first query."""
+    async with db.async_session() as session:
+        yield session
+
+
 # ==================== Authentication Dependencies ====================
 
 security = HTTPBearer()
 
+# Short-lived per-process cache of authenticated users so hot tokens skip the DB lookup.
+# Entries are minimal User proxies carrying only id and is_active.
+# Deletes evict locally via evict_authenticated_user; other workers catch up within the TTL.
+_USER_CACHE_MAX = 4096
+_USER_CACHE_TTL = 30.0
+_user_cache: OrderedDict[int, tuple[float, User]] = OrderedDict()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Get authenticated user from JWT token. Raises 401 if invalid/expired, 403 if inactive."""
-    # Extract token from Authorization header
-    token = credentials.credentials
-    
+
+def _cached_user(user_id: int) -> User | None:
+    """Return a cached user if it has not expired, refreshing its LRU position."""
+    entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at <= time.monotonic():
+        _user_cache.pop(user_id, None)
+        return None
+    _user_cache.move_to_end(user_id)
+    return user
+
+
+def _remember_user(user: User) -> None:
+    """Cache an authenticated user, evicting the least recently used entry when full."""
+    _user_cache[user.id] = (time.monotonic() + _USER_CACHE_TTL, user)
+    _user_cache.move_to_end(user.id)
+    if len(_user_cache) > _USER_CACHE_MAX:
+        _user_cache.popitem(last=False)
+
+
+def evict_authenticated_user(user_id: int) -> None:
+    """Drop a user from the authentication cache (call when the user is deleted or changed)."""
+    _user_cache.pop(user_id, None)
+
+
+def _user_id_from_token(credentials: HTTPAuthorizationCredentials) -> int:
+    """Decode the bearer token and return its subject. Raises 401 if invalid/expired."""
     # Decode and validate token
-    payload = decode_access_token(token)
+    payload = decode_access_token(credentials.credentials)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,9 +87,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             },
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # Fetch user from database
-    user = await select_user(int(user_id))
+    return int(user_id)
+
+
+def _ensure_active(user: User | None, user_id: int) -> User:
+    """Return the user, raising 401 if it does not exist and 403 if it is inactive."""
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,7 +113,36 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 "details": {"user_id": user_id}
             },
         )
+    return user
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    """Get authenticated user from JWT token. Raises 401 if invalid/expired, 403 if inactive.
+    
+    The returned User only carries id and is_active; load the full profile separately.
+    """
+    # Already resolved earlier in this request
+    current = getattr(request.state, "current_user", None)
+    if current is not None:
+        return current
+    
+    user_id = _user_id_from_token(credentials)
+    
+    # Fetch user from the short-lived cache, falling back to an (id, is_active) lookup
+    user = _cached_user(user_id)
+    if user is None:
+        row = await select_user_auth_row(user_id, session=session)
+        # Return the connection now instead of holding it idle until dependency teardown
+        await session.close()
+        if row is not None:
+            user = User(id=row[0], is_active=row[1])
+            _remember_user(user)
     
+    request.state.current_user = _ensure_active(user, user_id)
     return user
 
 
@@ -1,10 +1,32 @@
 """Centralized logging configuration for the application."""
 
+import json
 import logging
 import sys
+import time
 from .config import settings
 
 
+class JSONFormatter(logging.Formatter):
+    """Render log records as compact single-line JSON for file output."""
+
+    def format(self, record):
+        # Stamp with the record's creation time rather than the (later) format time
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        log_data = {
+            "timestamp": f"{ts}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        if record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log_data, separators=(",", ":"))
+
+
 def setup_logger() -> logging.Logger:
     """Configure and return application logger with console and optional file handlers."""
     logger = logging.getLogger("user_microservice")
@@ -28,24 +50,6 @@ def setup_logger() -> logging.Logger:
         try:
             file_handler = logging.FileHandler(settings.LOG_FILE)
             if settings.LOG_FORMAT == "json":
-                import json
-                from datetime import datetime
-                
-                class JSONFormatter(logging.Formatter):
-                    def format(self, record):
-                        log_data = {
-                            "timestamp": datetime.utcnow().isoformat() + "Z",
-                            "level": record.levelname,
-                            "logger": record.name,
-                            "message": record.getMessage(),
-                            "module": record.module,
-                            "function": record.funcName,
-                            "line": record.lineno,
-                        }
-                        if record.exc_info:
-                            log_data["exception"] = self.formatException(record.exc_info)
-                        return json.dumps(log_data)
-                
                 file_handler.setFormatter(JSONFormatter())
             else:
                 file_handler.setFormatter(console_format)
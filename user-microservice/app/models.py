@@ -1,6 +1,6 @@
 """SQLAlchemy ORM models for database tables."""
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, UniqueConstraint
 from sqlalchemy.sql import func
 from .db import Base
 from .config import settings
@@ -10,10 +10,12 @@ class User(Base):
     """User model mapped to 'users' table."""
     
     __tablename__ = "users"
+    # The primary key and unique constraint already provide btree indexes on id and email
+    __table_args__ = (UniqueConstraint("email", name="uq_users_email"),)
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(settings.USER_NAME_MAX_LENGTH), nullable=False)
-    email = Column(String(settings.USER_EMAIL_MAX_LENGTH), nullable=False, unique=True, index=True)
+    email = Column(String(settings.USER_EMAIL_MAX_LENGTH), nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
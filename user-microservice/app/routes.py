@@ -2,7 +2,7 @@
 
 import os
 from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from .schemas import (
     UserOut,
     PaginatedUserResponse,
@@ -120,7 +120,8 @@ async def get_current_user(
     current_user: User = Depends(get_current_active_user),
 ):
     """Get authenticated user profile. Requires valid JWT token."""
-    return UserOut.model_validate(current_user)
+    # Auth resolved only id/is_active; the profile comes from the Redis-cached read path
+    return await services.get_user(current_user.id)
 
 
 # ==================== User Management Endpoints ====================
@@ -181,6 +182,25 @@ async def search_users(
     )
 
 
+@router.get("/users/export")
+@conditional_limit(settings.RATE_LIMIT_BATCH)
+async def export_users(
+    request: Request,
+    email: str | None = None,
+    email_domain: str | None = None,
+    sort: str = "id",
+    order: str = "asc",
+):
+    """Stream all matching users as newline-delimited JSON."""
+    lines = services.export_users(
+        email=email,
+        email_domain=email_domain,
+        sort=sort,
+        order=order,
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.get("/users/{user_id}", response_model=UserOut)
 @conditional_limit(settings.RATE_LIMIT_READ)
 async def get_user(user_id: int, request: Request):
@@ -4,6 +4,9 @@ Handles user CRUD operations, authentication, batch operations, and search.
 Implements caching strategy for frequently accessed user data.
 """
 
+import asyncio
+from collections.abc import AsyncIterator
+
 from .schemas import (
     UserOut,
     PaginatedUserResponse,
@@ -21,13 +24,15 @@ from .crud import (
     select_user,
     select_user_by_email,
     list_users as crud_list_users,
+    iter_users as crud_iter_users,
     delete_user as crud_delete_user,
     insert_users as crud_insert_users,
     delete_users as crud_delete_users,
     search_users as crud_search_users,
 )
-from .auth import hash_password, verify_password, create_access_token
-from .cache import cache_manager, make_cache_key, USER_BY_ID_PREFIX, USER_BY_EMAIL_PREFIX
+from .auth import hash_password_async, verify_password_async, create_access_token
+from .cache import cache_manager, user_id_key, user_email_key
+from .dependencies import evict_authenticated_user
 from .config import settings
 from .models import User
 from fastapi import HTTPException
@@ -76,24 +81,18 @@ def _validate_sort_params(sort: str, order: str) -> tuple[str, str]:
     return sort, order
 
 
-async def _cache_user(user_out: UserOut) -> None:
+async def _cache_user(user_out: UserOut, *, nx: bool = False) -> None:
     """Cache user data by both ID and email if caching is enabled."""
     if settings.CACHE_ENABLED:
-        await cache_manager.set(
-            make_cache_key(USER_BY_ID_PREFIX, user_out.id),
-            user_out.model_dump()
-        )
-        await cache_manager.set(
-            make_cache_key(USER_BY_EMAIL_PREFIX, user_out.email),
-            user_out.model_dump()
-        )
+        await cache_manager.set_user(user_out.model_dump(), nx=nx)
 
 
 async def _invalidate_user_cache(user: User) -> None:
     """Invalidate cached user data by both ID and email if caching is enabled."""
+    evict_authenticated_user(user.id)
     if settings.CACHE_ENABLED:
-        await cache_manager.delete(make_cache_key(USER_BY_ID_PREFIX, user.id))
-        await cache_manager.delete(make_cache_key(USER_BY_EMAIL_PREFIX, user.email))
+        await cache_manager.delete(user_id_key(user.id))
+        await cache_manager.delete(user_email_key(user.email))
 
 
 # ==================== User Operations ====================
@@ -104,7 +103,7 @@ async def get_user(user_id: int) -> UserOut:
     logger.debug(f"Fetching user: id={user_id}")
     
     if settings.CACHE_ENABLED:
-        cache_key = make_cache_key(USER_BY_ID_PREFIX, user_id)
+        cache_key = user_id_key(user_id)
         cached_data = await cache_manager.get(cache_key)
         if cached_data:
             logger.debug(f"Cache hit for user: id={user_id}")
@@ -124,7 +123,8 @@ async def get_user(user_id: int) -> UserOut:
     
     logger.debug(f"User retrieved from DB: id={user.id} email={user.email}")
     user_out = _convert_to_user_out(user)
-    await _cache_user(user_out)
+    # NX: concurrent misses for the same user populate the cache only once
+    await _cache_user(user_out, nx=True)
     
     return user_out
 
@@ -184,6 +184,23 @@ async def list_users(
         pages=pages
     )
 
+
+async def export_users(
+    email: str | None = None,
+    email_domain: str | None = None,
+    sort: str = "id",
+    order: str = "asc",
+) -> AsyncIterator[bytes]:
+    """Yield every matching user as one NDJSON line, streamed from the database without buffering."""
+    sort, order = _validate_sort_params(sort, order)
+    logger.debug(
+        "Exporting users: filters=(email=%s, domain=%s) sort=%s order=%s",
+        email, email_domain, sort, order,
+    )
+    async for user in crud_iter_users(email=email, email_domain=email_domain, sort=sort, order=order):
+        yield _convert_to_user_out(user).model_dump_json().encode() + b"\n"
+
+
 # ==================== Batch Operations ====================
 
 
@@ -205,13 +222,15 @@ async def batch_create_users(data: BatchCreateRequest) -> BatchCreateResponse:
     logger.info(f"Batch creating {len(data.items)} users")
     
     try:
+        # Hash concurrently on the bcrypt pool instead of serially on the event loop
+        hashes = await asyncio.gather(*(hash_password_async(u.password) for u in data.items))
         items = [
             {
                 "name": u.name,
                 "email": u.email,
-                "hashed_password": hash_password(u.password)
+                "hashed_password": hashed
             }
-            for u in data.items
+            for u, hashed in zip(data.items, hashes)
         ]
         users = await crud_insert_users(items)
         created_items = [_convert_to_user_out(u) for u in users]
@@ -249,9 +268,8 @@ async def batch_delete_users(req: BatchDeleteRequest) -> BatchDeleteResponse:
     deleted = await crud_delete_users(req.ids)
     
     # Batch invalidate cache
-    if settings.CACHE_ENABLED:
-        for user in deleted:
-            await _invalidate_user_cache(user)
+    for user in deleted:
+        await _invalidate_user_cache(user)
     
     logger.info(f"Batch delete completed: {len(deleted)} users deleted")
     items = [_convert_to_user_out(u) for u in deleted]
@@ -302,7 +320,7 @@ async def register_user(data: UserRegister) -> UserOut:
             }
         )
     
-    hashed_password = hash_password(data.password)
+    hashed_password = await hash_password_async(data.password)
     
     try:
         user = await insert_user(data.name, data.email, hashed_password)
@@ -341,7 +359,7 @@ async def authenticate_user(data: UserLogin) -> Token:
             }
         )
     
-    if not verify_password(data.password, user.hashed_password):
+    if not await verify_password_async(data.password, user.hashed_password):
         logger.warning(f"Authentication failed - invalid password for user: {data.email}")
         raise HTTPException(
             status_code=401,
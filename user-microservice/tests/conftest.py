@@ -28,6 +28,7 @@ from sqlalchemy.pool import NullPool
 from app.main import app
 from app.db import Base
 from app import db as app_db
+from app import dependencies as app_dependencies
 from app.cache import cache_manager
 
 # Connect to Redis cache once at module import
@@ -55,12 +56,16 @@ async def test_db_engine():
         bind=engine,
         class_=AsyncSession,
         expire_on_commit=False,
+        autoflush=False,
     )
     
     # Store original session maker and override it BEFORE creating tables
     original_session = app_db.async_session
     app_db.async_session = test_session_maker
     
+    # Tables are recreated per test, so user ids repeat; forget previously authenticated users
+    app_dependencies._user_cache.clear()
+    
     # Create all tables using SQLAlchemy (tests use direct creation for speed)
     # Note: Production uses Alembic migrations instead
     async with engine.begin() as conn:
@@ -3,8 +3,13 @@ Integration tests for User Microservice API endpoints.
 Tests all CRUD operations, pagination, filtering, search, and batch operations.
 """
 
+import json
+
 import pytest
+from sqlalchemy import event
 
+from app import dependencies
+from app.cache import cache_manager, user_id_key
 
 # ==================== POST /auth/register - Create User ====================
 
@@ -129,6 +134,59 @@ async def test_create_user_name_trimmed(client):
     assert data["name"] == "John Doe"  # Should be trimmed
 
 
+# ==================== GET /users/me - Current User ====================
+
+@pytest.mark.asyncio
+async def test_get_me_cold_cache_holds_one_connection(client, test_db_engine, sample_user):
+    """Test /users/me on cold caches never holds more than one DB connection at a time."""
+    created = (await client.post("/auth/register", json=sample_user)).json()
+    login = await client.post(
+        "/auth/login",
+        json={"email": sample_user["email"], "password": sample_user["password"]},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    dependencies._user_cache.clear()
+    await cache_manager.delete(user_id_key(created["id"]))
+    
+    pool = test_db_engine.sync_engine.pool
+    counts = {"held": 0, "peak": 0, "total": 0}
+
+    def on_checkout(*args):
+        counts["held"] += 1
+        counts["total"] += 1
+        counts["peak"] = max(counts["peak"], counts["held"])
+
+    def on_checkin(*args):
+        counts["held"] -= 1
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        response = await client.get("/users/me", headers=headers)
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    
+    assert response.status_code == 200
+    assert response.json()["email"] == sample_user["email"]
+    # Auth row and profile load run back to back; the auth session is released in between
+    assert counts["peak"] == 1
+    assert counts["total"] == 2
+    
+    # Warm auth LRU and Redis profile: no database round trip at all
+    counts["total"] = 0
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        response = await client.get("/users/me", headers=headers)
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    
+    assert response.status_code == 200
+    assert counts["total"] == 0
+
+
 # ==================== GET /users/{user_id} - Read User ====================
 
 @pytest.mark.asyncio
@@ -463,6 +521,42 @@ async def test_search_users_with_pagination(client, sample_users):
     assert data["limit"] == 2
 
 
+# ==================== GET /users/export - Stream Users ====================
+
+@pytest.mark.asyncio
+async def test_export_users_ndjson(client, sample_users):
+    """Test exporting users streams one JSON object per line in sort order."""
+    for user in sample_users:
+        await client.post("/auth/register", json=user)
+    
+    response = await client.get("/users/export?sort=email&order=desc")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    emails = [row["email"] for row in rows]
+    assert len(rows) == len(sample_users)
+    assert emails == sorted(emails, reverse=True)
+    assert all("hashed_password" not in row for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_export_users_filter_by_domain(client, sample_users):
+    """Test exporting users honours the email domain filter."""
+    for user in sample_users:
+        await client.post("/auth/register", json=user)
+    await client.post(
+        "/auth/register",
+        json={"name": "Frank", "email": "frank@other.org", "password": "password123"},
+    )
+    
+    response = await client.get("/users/export?email_domain=other.org")
+    
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["email"] for row in rows] == ["frank@other.org"]
+
+
 # ==================== POST /users/batch-create - Batch Create ====================
 
 @pytest.mark.asyncio
@@ -2,8 +2,14 @@
 Tests for Redis cache functionality.
 """
 
+import asyncio
+
 import pytest
-from app.cache import cache_manager, make_cache_key, USER_BY_ID_PREFIX, USER_BY_EMAIL_PREFIX
+from redis.exceptions import RedisError
+from app.cache import (
+    CacheManager, cache_manager, make_cache_key, user_id_key, user_email_key, USER_BY_ID_PREFIX, USER_BY_EMAIL_PREFIX,
+    INVALIDATE_CHANNEL,
+)
 from app.services import get_user, register_user, delete_user
 from app.schemas import UserRegister
 
@@ -33,6 +39,89 @@ async def test_cache_pattern_delete(client):
     await cache_manager.delete("other:key")
 
 
+@pytest.mark.asyncio
+async def test_cache_mset_mget(client):
+    """Test batched set and get round-trip, including missing keys."""
+    assert await cache_manager.mset({"test:multi:1": {"id": 1}, "test:multi:2": {"id": 2}}, ttl=60)
+    
+    values = await cache_manager.mget(["test:multi:1", "test:multi:missing", "test:multi:2"])
+    assert values == {"test:multi:1": {"id": 1}, "test:multi:missing": None, "test:multi:2": {"id": 2}}
+    
+    # Cleanup
+    await cache_manager.delete_pattern("test:multi:*")
+
+
+@pytest.mark.asyncio
+async def test_local_tier_evicted_on_delete(client):
+    """Test that a locally cached copy is dropped when the key is deleted."""
+    await cache_manager.set("test:local:1", {"id": 1}, ttl=60)
+    assert await cache_manager.get("test:local:1") == {"id": 1}
+    assert cache_manager._local_get("test:local:1") == {"id": 1}, "Redis hit should populate local tier"
+    
+    await cache_manager.delete("test:local:1")
+    assert cache_manager._local_get("test:local:1") is None
+    assert await cache_manager.get("test:local:1") is None
+
+
+@pytest.mark.asyncio
+async def test_overwrite_publishes_invalidation(client):
+    """Test that a non-NX write broadcasts the key so other workers drop local copies."""
+    pubsub = cache_manager._redis.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(INVALIDATE_CHANNEL)
+    try:
+        await cache_manager.set("test:local:2", {"id": 2}, ttl=60)
+        message = None
+        for _ in range(10):
+            message = await pubsub.get_message(timeout=0.5)
+            if message is not None:
+                break
+    finally:
+        await pubsub.aclose()
+    
+    assert message is not None, "Overwrite should publish an invalidation"
+    assert message["data"] == b"test:local:2"
+
+
+def test_local_tier_returns_copies():
+    """Test that mutating a local-tier result does not corrupt the cached entry."""
+    manager = CacheManager()
+    manager._listening = True
+    manager._local_put("test:local:3", {"id": 3})
+    manager._local_get("test:local:3")["id"] = 99
+    
+    assert manager._local_get("test:local:3") == {"id": 3}
+
+
+class _BrokenPubSub:
+    """Pub/sub stand-in whose connection drops as soon as it is read."""
+    
+    async def listen(self):
+        raise RedisError("connection lost")
+        yield
+    
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_local_tier_bypassed_after_listener_failure(monkeypatch):
+    """Test that a dead invalidation listener clears and bypasses the local tier until it resubscribes."""
+    manager = CacheManager()
+    manager._listening = True
+    manager._local_put("test:local:5", {"id": 5})
+    
+    async def _stop_before_resubscribe(delay):
+        raise asyncio.CancelledError
+    
+    monkeypatch.setattr("app.cache._sleep", _stop_before_resubscribe)
+    with pytest.raises(asyncio.CancelledError):
+        await manager._listen_invalidations(_BrokenPubSub())
+    
+    assert manager._local_get("test:local:5") is None
+    manager._local_put("test:local:5", {"id": 5})
+    assert not manager._local, "Local tier must not fill while invalidations are not arriving"
+
+
 @pytest.mark.asyncio
 async def test_get_user_cache_hit(client):
     """Test that get_user returns cached data on second call."""
@@ -138,3 +227,9 @@ async def test_make_cache_key():
     key3 = make_cache_key(USER_BY_ID_PREFIX, 456)
     assert key3.startswith("user:id:")
 
+
+@pytest.mark.asyncio
+async def test_user_key_helpers_match_make_cache_key():
+    """Test that the user key fast paths produce the same keys as make_cache_key."""
+    assert user_id_key(456) == make_cache_key(USER_BY_ID_PREFIX, 456)
+    assert user_email_key("test@example.com") == make_cache_key(USER_BY_EMAIL_PREFIX, "test@example.com")
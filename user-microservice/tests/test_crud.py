@@ -9,6 +9,7 @@ from sqlalchemy.exc import IntegrityError
 from app.crud import (
     insert_user,
     select_user,
+    select_user_auth_row,
     delete_user,
     list_users,
     search_users,
@@ -63,6 +64,13 @@ class TestSelectUser:
         """Test selecting non-existent user returns None."""
         user = await select_user(99999)
         assert user is None
+    
+    async def test_select_user_auth_row(self, test_db_engine):
+        """Test the auth lookup returns only (id, is_active)."""
+        created_user = await insert_user("Test User", "test@example.com", get_test_password_hash())
+        
+        assert await select_user_auth_row(created_user.id) == (created_user.id, True)
+        assert await select_user_auth_row(99999) is None
 
 
 @pytest.mark.asyncio
@@ -82,6 +82,34 @@ async def test_retry_on_db_error_no_retry_on_constraint_violation():
     assert call_count == 1
 
 
+class _PgError(Exception):
+    """Stand-in for a driver error carrying a SQLSTATE."""
+    
+    def __init__(self, message: str, sqlstate: str):
+        super().__init__(message)
+        self.sqlstate = sqlstate
+
+
+@pytest.mark.asyncio
+async def test_retry_on_db_error_uses_sqlstate_over_message():
+    """Test retry classification prefers the SQLSTATE code over message text."""
+    attempts = {"08006": 0, "23505": 0}
+    
+    def raiser(sqlstate: str):
+        async def fail():
+            attempts[sqlstate] += 1
+            # Message mentions "connection" either way; only the code should matter
+            raise OperationalError("stmt", None, _PgError("connection issue", sqlstate))
+        return fail
+    
+    with pytest.raises(OperationalError):
+        await db.retry_on_db_error(raiser("08006"), max_retries=3, base_delay=0.01)
+    with pytest.raises(OperationalError):
+        await db.retry_on_db_error(raiser("23505"), max_retries=3, base_delay=0.01)
+    
+    assert attempts == {"08006": 3, "23505": 1}
+
+
 # Note: Session context manager tests removed due to Python 3.14 event loop issues
 # The retry logic and health check (tested above) are the core resilience features
 # Session management is already tested extensively in other test files
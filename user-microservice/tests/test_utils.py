@@ -3,7 +3,11 @@ Unit tests for utility functions.
 Tests simple, isolated utility functions without dependencies.
 """
 
+import json
+import logging
+
 import pytest
+from app.logger import JSONFormatter
 from app.utils import normalize_email
 
 
@@ -39,3 +43,22 @@ class TestNormalizeEmail:
         assert normalize_email("test+tag@example.com") == "test+tag@example.com"
         assert normalize_email("test.name@example.com") == "test.name@example.com"
         assert normalize_email("test_name@example.com") == "test_name@example.com"
+
+
+class TestJSONFormatter:
+    """Test the JSONFormatter used for file logs."""
+    
+    def test_format_compact_json(self):
+        """Test records render as compact JSON stamped with their creation time."""
+        record = logging.LogRecord("user_microservice", logging.INFO, "app/x.py", 7, "hello %s", ("world",), None)
+        record.created = 0.25
+        record.msecs = 250.0
+        
+        line = JSONFormatter().format(record)
+        
+        assert ", " not in line and ": " not in line
+        data = json.loads(line)
+        assert data["timestamp"] == "1970-01-01T00:00:00.250Z"
+        assert data["level"] == "INFO"
+        assert data["message"] == "hello world"
+        assert data["line"] == 7